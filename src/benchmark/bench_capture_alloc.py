@@ -0,0 +1,150 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sender capture benchmark (allocating resize / color conversion vs capture stage of SenderPipeline) """
+
+import os
+import sys
+import time
+import tracemalloc
+import cv2
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sender_pipeline
+
+CAMERA_WIDTH = 1920
+CAMERA_HEIGHT = 1080
+RESOLUTIONS = ((300, 300), (640, 480), (1280, 720))
+FRAMES = 200
+FRAME_MSEC = 0.001  # capture deadlines never wait
+
+
+class CameraStub:
+    """ camera frames decoded like cv2.VideoCapture.read(image) """
+    def __init__(self, width, height):
+        """ init """
+        self.frame = numpy.random.randint(0, 256, (height, width, 3), numpy.uint8)
+
+    def read(self, image=None):
+        """ (ret, frame) : new array, or decoded into image of same size """
+        if image is None or image.shape != self.frame.shape:
+            return True, self.frame.copy()
+        numpy.copyto(image, self.frame)
+        return True, image
+
+    def grab(self):
+        """ skip frame """
+        return True
+
+    def release(self):
+        """ nothing to close """
+
+
+class CountingCapture:
+    """ camera for SenderPipeline.run : stop after warmup + frames, peak traced growth between reads """
+    def __init__(self, camera, pipeline, frames, warmup=0, traced=False):
+        """ init """
+        self.camera = camera
+        self.pipeline = pipeline
+        self.frames = frames
+        self.warmup = warmup  # frames allocating capture frame, ring slots & preview buffer
+        self.traced = traced
+        self.count = 0
+        self.allocated = 0
+        self.base = 0
+
+    def read(self, image=None):
+        """ (ret, frame) of camera, (False, None) after frames """
+        if self.traced:
+            # previous capture iteration : resize into ring slot, preview copy, scheduling
+            if self.count > self.warmup:
+                self.allocated = self.allocated + tracemalloc.get_traced_memory()[1] - self.base
+            tracemalloc.reset_peak()
+            self.base = tracemalloc.get_traced_memory()[0]
+        self.count = self.count + 1
+        if self.count > self.warmup + self.frames:
+            self.pipeline.trig = False
+            return False, None
+        return self.camera.read(image)
+
+    def grab(self):
+        """ skip frame """
+        return self.camera.grab()
+
+
+def allocating_path(cap, size, state):
+    """ previous capture path : read + resize + asarray + cvtColor, new arrays every frame """
+    ret, frame = cap.read()
+    np_frame = numpy.asarray(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+    preview = cv2.cvtColor(np_frame, cv2.COLOR_BGR2RGB)
+    return np_frame, preview
+
+def measure_allocating(cap, size):
+    """ time & allocation per frame of previous capture path """
+    state = {}
+    allocating_path(cap, size, state)  # warm up
+
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        allocating_path(cap, size, state)
+    elapsed = time.perf_counter() - start
+
+    # peak traced growth during frame = bytes allocated per frame (temporaries included)
+    allocated = 0
+    tracemalloc.start()
+    for _ in range(FRAMES):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        result = allocating_path(cap, size, state)
+        allocated = allocated + tracemalloc.get_traced_memory()[1] - base
+        del result
+    tracemalloc.stop()
+    report("allocating", size, elapsed / FRAMES, allocated / FRAMES)
+
+def run_pipeline(camera, size, frames, warmup=0, traced=False):
+    """ SenderPipeline capture stage(caller thread) for frames, preview shown at once by viewer -> capture """
+    pipeline = sender_pipeline.SenderPipeline(None, None, lambda: None, size[0], size[1], FRAME_MSEC,
+                                              preview=lambda frame: pipeline.preview_buffer.done(), preview_fps=0)
+    capture = CountingCapture(camera, pipeline, frames, warmup, traced)
+    pipeline.video_cap = capture
+    pipeline.run()
+    return capture
+
+def measure_pipeline(cap, size):
+    """ time & allocation per frame of SenderPipeline.run capture stage (encode / send threads not started) """
+    run_pipeline(cap, size, 1)  # warm up
+
+    start = time.perf_counter()
+    run_pipeline(cap, size, FRAMES)
+    elapsed = time.perf_counter() - start
+
+    # new pipeline allocates capture frame, every ring slot & preview buffer in first frames
+    tracemalloc.start()
+    capture = run_pipeline(cap, size, FRAMES, sender_pipeline.FRAME_RING_SLOTS + 1, traced=True)
+    tracemalloc.stop()
+    report("pipeline", size, elapsed / FRAMES, capture.allocated / FRAMES)
+
+def report(name, size, frame_time, frame_bytes):
+    """ print result line """
+    print("{:>4}x{:<4} {:<13} {:>9.1f} us/frame  {:>10.0f} bytes allocated/frame".format(
+        size[0], size[1], name, frame_time * 1000000, frame_bytes))
+
+
+if __name__ == "__main__":
+    camera = CameraStub(CAMERA_WIDTH, CAMERA_HEIGHT)
+    for resolution in RESOLUTIONS:
+        measure_allocating(camera, resolution)
+        measure_pipeline(camera, resolution)
@@ -0,0 +1,123 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Receiver header log benchmark (deque of per-packet lists vs columnar ring buffer) """
+
+import os
+import sys
+import gc
+import time
+import struct
+import datetime
+import tracemalloc
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import packet_codec
+import receiver_log
+
+MESSAGE_RATE = 6000    # messages/s of receiver (two streams)
+HEADER_LOG_CYCLE = 60  # seconds between log file writes
+RECORDS = MESSAGE_RATE * HEADER_LOG_CYCLE
+
+
+def rx_header(seq):
+    """ V2X_RxPDU + DB_V2X bytes of video message """
+    encoder = packet_codec.VideoHeaderEncoder()
+    return b"\xf3\xf2" + bytes(36) + encoder.header(0, seq, 37.5, 127.25)[packet_codec.V2X_TX_PDU_LEN:
+                                                                        packet_codec.V2X_TX_PDU_LEN
+                                                                        + packet_codec.DB_V2X_LEN]
+
+class GcTimer:
+    """ time spent in garbage collection (gc callbacks) """
+    def __init__(self):
+        """ init """
+        self.start = 0.0
+        self.total = 0.0
+
+    def __call__(self, phase, info):
+        """ gc callback """
+        if phase == "start":
+            self.start = time.perf_counter()
+        else:
+            self.total = self.total + time.perf_counter() - self.start
+
+def list_append(header_q, header, count):
+    """ previous header log : list of header bytes, results & datetime per message """
+    for _ in range(count):
+        header_q.append([bytes(header), 0, 0, 99.5, 12.5, 1.5, 30.0, 37.5, 127.25, datetime.datetime.now()])
+
+def list_drain(header_q):
+    """ previous log writer : popleft & unpack per record """
+    rows = 0
+    while header_q:
+        header_log = header_q.popleft()
+        struct.unpack(">i", header_log[0][38:42])
+        struct.unpack(">i", header_log[0][84:88])
+        struct.unpack(">i", header_log[0][88:92])
+        rows = rows + 1
+    return rows
+
+def column_append(header_log, header, count):
+    """ columnar header log append """
+    for _ in range(count):
+        header_log.append(header, 0, 0, 99.5, 12.5, 1.5, 30.0, 37.5, 127.25)
+
+def column_drain(header_log):
+    """ columnar log writer : bulk drain, fields as lists """
+    records = header_log.drain(time.monotonic_ns())
+    records["db_v2x"]["eDeviceType"].tolist()
+    records["db_v2x"]["ulPayloadLength"].tolist()
+    records["db_v2x"]["ulPayloadCrc32"].tolist()
+    return len(records["time_ns"])
+
+def measure(name, create, append, drain):
+    """ memory per record (traced), append time & gc time (untraced), drain time for one header log cycle """
+    header = memoryview(bytearray(rx_header(1)))  # message slice of receive buffer
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    log = create()
+    append(log, header, RECORDS)
+    memory = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del log
+
+    gc.collect()
+    gc_timer = GcTimer()
+    gc.callbacks.append(gc_timer)
+    log = create()
+    start = time.perf_counter()
+    append(log, header, RECORDS)
+    append_time = time.perf_counter() - start
+    gc.callbacks.remove(gc_timer)
+
+    start = time.perf_counter()
+    rows = drain(log)
+    drain_time = time.perf_counter() - start
+    assert rows == RECORDS
+    print("{:<9} {:>5.0f} bytes/record {:>6.1f} MB/cycle  append {:>5.2f} us/record  gc {:>6.1f} ms  "
+          "drain {:>6.1f} ms".format(name, memory / RECORDS, memory / 1000000, append_time * 1000000 / RECORDS,
+                                     gc_timer.total * 1000, drain_time * 1000))
+    return log
+
+
+if __name__ == "__main__":
+    print("{} records per {} s cycle at {} messages/s".format(RECORDS, HEADER_LOG_CYCLE, MESSAGE_RATE))
+    measure("list", deque, list_append, list_drain)
+    header_log = measure("columnar", receiver_log.HeaderLog, column_append, column_drain)
+    stats = header_log.stats()
+    print("columnar record {} bytes, buffer {:.1f} MB ({} records), peak occupancy {} records ({:.1f} %)".format(
+        stats["bytes_per_record"], stats["buffer_bytes"] / 1000000, header_log.capacity, stats["peak_records"],
+        stats["peak_occupancy"]))
@@ -0,0 +1,75 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Row packing benchmark (one row per packet vs packed rows) over a local socket pair """
+
+import os
+import sys
+import time
+import socket
+import threading
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sender_frame
+import sender_transmit
+
+FRAME_WIDTH = 300
+FRAME_HEIGHT = 300
+DURATION = 3.0  # seconds per layout
+
+
+def drain(sock, counter):
+    """ read until peer closes """
+    while True:
+        data = sock.recv(1 << 20)
+        if not data:
+            break
+        counter[0] = counter[0] + len(data)
+
+def measure(name, packetizer, np_frame):
+    """ packets/s, goodput, wire bytes """
+    send_sock, recv_sock = socket.socketpair()
+    received = [0]
+    reader = threading.Thread(target=drain, args=(recv_sock, received))
+    reader.start()
+    batch_sender = sender_transmit.BatchSender(send_sock)
+
+    seq = 0
+    frames = 0
+    packets = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        buffers, seq = packetizer.packetize(np_frame, seq, 37.5, 127.0)
+        batch_sender.send_buffers(buffers)
+        frames = frames + 1
+        packets = packets + packetizer.frame_packets
+    send_sock.shutdown(socket.SHUT_WR)
+    reader.join()
+    elapsed = time.perf_counter() - start
+    send_sock.close()
+    recv_sock.close()
+
+    goodput = frames * np_frame.nbytes * 8 / elapsed / 1000000
+    print("{:<14} {:>5} packets/frame  {:>10.0f} packets/s  {:>8.1f} Mbit/s goodput  {:>6.1f} fps  overhead {:>5.1f} %".format(
+        name, packets // frames, packets / elapsed, goodput, frames / elapsed,
+        (received[0] - frames * np_frame.nbytes) * 100 / received[0]))
+
+
+if __name__ == "__main__":
+    frame = numpy.random.randint(0, 256, (FRAME_HEIGHT, FRAME_WIDTH, 3), numpy.uint8)
+    measure("one row", sender_frame.FramePacketizer(), frame)
+    measure("whole rows", sender_frame.PackedRowPacketizer(whole_rows=True), frame)
+    measure("row fragments", sender_frame.PackedRowPacketizer(), frame)
@@ -0,0 +1,99 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Receiver header decoding benchmark (per-message slices & int.from_bytes vs NumPy structured dtype batch) """
+
+import os
+import sys
+import time
+import struct
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import packet_codec
+import receiver_stream
+import sender_frame
+
+FRAME_WIDTH = 300
+FRAME_HEIGHT = 300
+FRAMES = 20
+RECV_SIZES = (1024 * 12, 1024 * 64)  # bytes per recv() (ReceiveWorker : 12 KB)
+REPEAT = 5
+
+
+def rx_stream(frames):
+    """ OBU byte stream of raw video frames (V2X_TxPDU replaced by V2X_RxPDU) """
+    packetizer = sender_frame.PackedRowPacketizer()
+    frame = numpy.random.randint(0, 256, (FRAME_HEIGHT, FRAME_WIDTH, 3), numpy.uint8)
+    messages = []
+    seq = 0
+    for _ in range(frames):
+        buffers, seq = packetizer.packetize(frame, seq, 37.5, 127.0)
+        for i in range(0, len(buffers), 2):
+            body = (bytes(buffers[i]) + bytes(buffers[i + 1]))[packet_codec.V2X_TX_PDU_LEN:]
+            messages.append(receiver_stream.RX_MAGIC_NUM + bytes(34) + struct.pack("!H", len(body)) + body)
+    return b"".join(messages), len(messages)
+
+def per_message_path(data, recv_size):
+    """ previous receiver path : slices + int.from_bytes per message, 13 struct.unpack per header log record """
+    framer = receiver_stream.StreamFramer()
+    checksum = 0
+    for start in range(0, len(data), recv_size):
+        for message in framer.feed(data[start:start + recv_size]):
+            packet_header = message[0:38]
+            db_c2x_header = message[38:38 + 54]
+            payload_length = int.from_bytes(packet_header[36:38], "big") - 54
+            payload = message[38 + 54:38 + 54 + payload_length]
+            latitude = float(int.from_bytes(db_c2x_header[46:50], "big")) / 1000000
+            longitude = float(int.from_bytes(db_c2x_header[50:54], "big")) / 1000000
+            seq = int.from_bytes(payload[2:6], "big")
+            row = packet_codec.BAND_HEADER_STRUCT.unpack_from(payload, 6)[1]
+            header_log = packet_header + db_c2x_header
+            log = [struct.unpack(">i", header_log[offset:offset + 4])[0]
+                   for offset in (38, 42, 46, 58, 62, 66, 70, 74, 84, 88)]
+            log = log + [struct.unpack(">H", header_log[offset:offset + 2])[0] for offset in (78, 80, 82)]
+            checksum = checksum + seq + row + len(log) + int(latitude + longitude)
+    return checksum
+
+def batch_path(data, recv_size):
+    """ framer offsets + one structured dtype decode per recv chunk """
+    framer = receiver_stream.StreamFramer()
+    checksum = 0
+    for start in range(0, len(data), recv_size):
+        chunk, offsets, lengths = framer.feed_batch(data[start:start + recv_size])
+        if len(offsets) == 0:
+            continue
+        headers = receiver_stream.decode_headers(chunk, offsets, lengths)
+        checksum = checksum + int(headers["seq"].sum()) + int(headers["row"].sum()) + 13 * len(offsets) \
+            + int((headers["latitude"] + headers["longitude"]).astype(numpy.int64).sum())
+    return checksum
+
+def measure(name, func, data, messages, recv_size):
+    """ best of REPEAT runs -> messages/s """
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        checksum = func(data, recv_size)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print("{:>3} KB recv  {:<12} {:>10.0f} messages/s  {:>6.2f} us/message  (checksum {})".format(
+        recv_size // 1024, name, messages / best, best / messages * 1000000, checksum))
+
+
+if __name__ == "__main__":
+    stream, message_count = rx_stream(FRAMES)
+    for size in RECV_SIZES:
+        measure("per-message", per_message_path, stream, message_count, size)
+        measure("batch", batch_path, stream, message_count, size)
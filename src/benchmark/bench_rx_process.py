@@ -0,0 +1,150 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Receiver benchmark : max sustained packets/s of in-process engine vs receive process (GUI load by threads) """
+
+import os
+import sys
+import time
+import socket
+import struct
+import argparse
+import threading
+import multiprocessing
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import packet_codec
+import receiver_stream
+import receiver_engine
+import receiver_process
+
+FRAME_WIDTH = 300
+FRAME_HEIGHT = 300
+FLOOD_PORT = 47399
+WARMUP = 2      # seconds before measurement
+DURATION = 5    # seconds of measurement
+VIEW_CYCLE = 0.02  # seconds, viewer(ViewWorker) render cycle
+
+
+def rx_rows(frames=4):
+    """ OBU byte stream of raw row messages (V2X_RxPDU + DB_V2X + indicator + seq + line number + row) """
+    encoder = packet_codec.VideoHeaderEncoder()
+    messages = []
+    seq = 0
+    for _ in range(frames):
+        frame = numpy.random.randint(0, 256, (FRAME_HEIGHT, FRAME_WIDTH, 3), numpy.uint8)
+        for row in range(FRAME_HEIGHT):
+            video_data = struct.pack(">h", row) + frame[row].tobytes()
+            body = bytes(encoder.encode(video_data, seq, 37.5, 127.0))[packet_codec.V2X_TX_PDU_LEN:]
+            messages.append(receiver_stream.RX_MAGIC_NUM + bytes(34) + struct.pack("!H", len(body)) + body)
+            seq = seq + 1
+    return b"".join(messages)
+
+def drain(sock):
+    """ discard receiver requests (ping) """
+    try:
+        while sock.recv(4096):
+            pass
+    except OSError:
+        pass
+
+def flood(port, ready):
+    """ stand-in OBU process : send stream repeatedly to one receiver until it disconnects """
+    data = memoryview(rx_rows())
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", port))
+    server.listen(1)
+    ready.set()
+    sock, _ = server.accept()
+    threading.Thread(target=drain, args=(sock,), daemon=True).start()
+    try:
+        while True:
+            sock.sendall(data)
+    except OSError:
+        pass
+    sock.close()
+    server.close()
+
+def gui_load(stop):
+    """ pure python work holding GIL (graph / GUI threads of receiver window) """
+    while not stop.is_set():
+        total = 0
+        for value in range(10000):
+            total = total + value * value
+
+def view(streams, stop):
+    """ viewer : render published frames like ViewWorker """
+    generations = {}
+    frames = {}
+    while not stop.is_set():
+        for stream_id in list(streams):
+            frame_store = streams[stream_id].frame_store
+            if stream_id not in frames:
+                frames[stream_id] = numpy.empty_like(frame_store.front)
+            generations[stream_id] = frame_store.read(generations.get(stream_id, -1), frames[stream_id])
+        time.sleep(VIEW_CYCLE)
+
+def measure(mode, load_threads, port):
+    """ messages/s & published frames/s of stream 0 (mean of metric snapshots after warm up) """
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=flood, args=(port, ready), daemon=True)
+    server.start()
+    ready.wait()
+
+    if mode == "process":
+        engine = receiver_process.ReceiverProcess("127.0.0.1", port, FRAME_WIDTH, FRAME_HEIGHT, False)
+    else:
+        engine = receiver_engine.ReceiverEngine("127.0.0.1", port, FRAME_WIDTH, FRAME_HEIGHT, False)
+    stop = threading.Event()
+    threads = [threading.Thread(target=gui_load, args=(stop,), daemon=True) for _ in range(load_threads)]
+    threads.append(threading.Thread(target=view, args=(engine.streams, stop), daemon=True))
+    engine.start()
+    for thread in threads:
+        thread.start()
+
+    rates = []
+    frame_rates = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < WARMUP + DURATION:
+        time.sleep(1)
+        snapshot = engine.snapshot()
+        if snapshot and time.perf_counter() - start > WARMUP:
+            rates.append(snapshot["framer"]["messages_per_sec"])
+            frame_rates.append(snapshot["streams"][0]["store"]["published_per_sec"])
+
+    stop.set()
+    for thread in threads:
+        thread.join(1)
+    engine.stop()
+    server.terminate()
+    server.join(1)
+    rate = sum(rates) / len(rates) if rates else 0.0
+    frame_rate = sum(frame_rates) / len(frame_rates) if frame_rates else 0.0
+    print("{:<8} {:>2} load threads {:>10.0f} packets/s {:>8.1f} frames/s".format(
+        mode, load_threads, rate, frame_rate))
+    return rate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="in-process vs receive process receive rate")
+    parser.add_argument("--load-threads", type=int, nargs="+", default=[0, 2], help="GUI load threads per run")
+    args = parser.parse_args()
+    port = FLOOD_PORT
+    for load_threads in args.load_threads:
+        for mode in ("engine", "process"):
+            measure(mode, load_threads, port)
+            port = port + 1
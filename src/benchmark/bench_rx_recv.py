@@ -0,0 +1,130 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Receiver receive-path benchmark (recv + bytes slices vs recv_into pooled buffer + memoryview slices) """
+
+import os
+import sys
+import time
+import socket
+import struct
+import threading
+import tracemalloc
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import packet_codec
+import receiver_stream
+
+FRAME_WIDTH = 300
+FRAME_HEIGHT = 300
+MESSAGES = 60000       # per measurement
+TRACED_MESSAGES = 6000  # per allocation measurement (tracemalloc is slow)
+
+
+def rx_rows(frames=1):
+    """ OBU byte stream of raw row messages (V2X_RxPDU + DB_V2X + indicator + seq + line number + row) """
+    encoder = packet_codec.VideoHeaderEncoder()
+    frame = numpy.random.randint(0, 256, (FRAME_HEIGHT, FRAME_WIDTH, 3), numpy.uint8)
+    messages = []
+    seq = 0
+    for _ in range(frames):
+        for row in range(FRAME_HEIGHT):
+            video_data = struct.pack(">h", row) + frame[row].tobytes()
+            body = bytes(encoder.encode(video_data, seq, 37.5, 127.0))[packet_codec.V2X_TX_PDU_LEN:]
+            messages.append(receiver_stream.RX_MAGIC_NUM + bytes(34) + struct.pack("!H", len(body)) + body)
+            seq = seq + 1
+    return b"".join(messages), len(messages)
+
+def flood(sock, data, stop):
+    """ send stream repeatedly until stop """
+    view = memoryview(data)
+    try:
+        while not stop.is_set():
+            sock.sendall(view)
+    except OSError:
+        pass
+
+def write_row(frame, payload):
+    """ raw row payload -> frame row """
+    row = struct.unpack(">h", payload[6:8])[0]
+    frame[row] = numpy.frombuffer(payload[8:], dtype=numpy.uint8).reshape(FRAME_WIDTH, -1)
+
+def recv_path(sock, framer, frame, count, traced):
+    """ previous receive path : recv() bytes, message / payload slices copied """
+    received = 0
+    allocated = 0
+    while received < count:
+        if traced:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        packet = sock.recv(1024 * 12)
+        for message in framer.feed(packet):
+            payload = message[38 + 54:]
+            write_row(frame, payload)
+            received = received + 1
+        if traced:
+            allocated = allocated + tracemalloc.get_traced_memory()[1] - base
+    return received, allocated
+
+def recv_into_path(sock, framer, frame, count, traced):
+    """ recv_into pooled buffer, memoryview slices down to frame rows """
+    received = 0
+    allocated = 0
+    while received < count:
+        if traced:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        view, offsets, lengths = framer.recv_into(sock)
+        for offset, length in zip(offsets.tolist(), lengths.tolist()):
+            message = view[offset:offset + length]
+            payload = message[38 + 54:]
+            write_row(frame, payload)
+            received = received + 1
+        if traced:
+            allocated = allocated + tracemalloc.get_traced_memory()[1] - base
+    return received, allocated
+
+def measure(name, func, data):
+    """ max sustained messages/s (sender floods socket) & bytes allocated by receive path """
+    receiver, sender = socket.socketpair()
+    stop = threading.Event()
+    thread = threading.Thread(target=flood, args=(sender, data, stop), daemon=True)
+    thread.start()
+    framer = receiver_stream.StreamFramer()
+    frame = numpy.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), numpy.uint8)
+
+    func(receiver, framer, frame, 1000, False)  # warm up
+    start = time.perf_counter()
+    received, _ = func(receiver, framer, frame, MESSAGES, False)
+    rate = received / (time.perf_counter() - start)
+
+    tracemalloc.start()
+    traced, allocated = func(receiver, framer, frame, TRACED_MESSAGES, True)
+    tracemalloc.stop()
+
+    stop.set()
+    receiver.close()
+    sender.close()
+    thread.join(1)
+    per_message = allocated / traced
+    print("{:<10} {:>10.0f} messages/s  {:>8.0f} bytes allocated/message  {:>8.1f} MB allocated/s".format(
+        name, rate, per_message, per_message * rate / 1000000))
+
+
+if __name__ == "__main__":
+    stream, message_count = rx_rows(4)
+    measure("recv", recv_path, stream)
+    measure("recv_into", recv_into_path, stream)
@@ -0,0 +1,169 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sensor Sharing Service Message Codec(precompiled struct layouts) """
+
+import struct
+import numpy
+from socket import htonl, htons
+import packet_header_struct
+
+
+# Payload Indicator
+VIDEO_DATA_INDICATOR = b'\x03\x01'
+PING_INDICATOR = b'\x03\x02'
+VIDEO_BAND_INDICATOR = b'\x03\x03'
+VIDEO_FEC_INDICATOR = b'\x03\x04'
+
+# Video Band Payload Type
+PAYLOAD_TYPE_RAW = 0
+PAYLOAD_TYPE_JPEG = 1
+PAYLOAD_TYPE_WEBP = 2
+
+# V2X_TxPDU fixed values (same as scapy header of send_5g)
+TX_PDU_VALUES = {
+    "magic_num": htons(0xf2f2),
+    "ver": 0x0001,
+    "psid": 5271,
+    "e_payload_type": 4,
+    "tx_power": 20,
+    "transmitter_profile_id": 100,
+}
+
+# DB_V2X fixed values (ulPayloadLength / ulPayloadCrc32 carry latitude / longitude)
+DB_V2X_VALUES = {
+    "eDeviceType": htonl(0x0001),
+    "eTeleCommType": htonl(0x0002),
+    "unDeviceId": 0x0000,
+    "ulTimeStamp": 0x0000,
+    "eServiceId": htonl(0x0005),
+    "eActionType": htonl(0x0001),
+    "eRegionId": htonl(0x0004),
+    "ePayloadType": htonl(0x000b),
+    "eCommId": htonl(0x0001),
+    "usDbVer": 0x0001,
+    "usHwVer": 0x0111,
+    "usSwVer": 0x0001,
+    "ulPayloadLength": 0,
+    "ulPayloadCrc32": 0,
+}
+
+
+def compile_struct(packet_class):
+    """ scapy fields_desc -> struct.Struct (network byte order) """
+    fmt = "!" + "".join(field.fmt.lstrip("!<>=@") for field in packet_class.fields_desc)
+    return struct.Struct(fmt)
+
+def compile_dtype(packet_class):
+    """ scapy fields_desc -> numpy structured dtype (big endian, same layout as compile_struct) """
+    return numpy.dtype([(field.name, ">" + numpy.dtype(field.fmt.lstrip("!<>=@")).str[1:])
+                        for field in packet_class.fields_desc])
+
+def field_offset(packet_class, field_name):
+    """ byte offset of field in packet """
+    offset = 0
+    for field in packet_class.fields_desc:
+        if field.name == field_name:
+            return offset
+        offset = offset + struct.calcsize(field.fmt)
+    raise KeyError(field_name)
+
+def pack_fields(packet_class, layout, values):
+    """ pack field values(field default if not given) """
+    return layout.pack(*[values.get(field.name, field.default) for field in packet_class.fields_desc])
+
+
+V2X_TX_PDU_STRUCT = compile_struct(packet_header_struct.V2X_TxPDU)  # 50 bytes
+DB_V2X_STRUCT = compile_struct(packet_header_struct.DB_V2X)         # 54 bytes
+DB_V2X_DTYPE = compile_dtype(packet_header_struct.DB_V2X)
+V2X_TX_PDU_LEN = V2X_TX_PDU_STRUCT.size
+DB_V2X_LEN = DB_V2X_STRUCT.size
+
+# Patch positions
+TX_LENGTH_OFFSET = field_offset(packet_header_struct.V2X_TxPDU, "length")
+DB_GPS_OFFSET = V2X_TX_PDU_LEN + field_offset(packet_header_struct.DB_V2X, "ulPayloadLength")
+SEQ_OFFSET = V2X_TX_PDU_LEN + DB_V2X_LEN + len(VIDEO_DATA_INDICATOR)
+LENGTH_STRUCT = struct.Struct("!H")
+GPS_STRUCT = struct.Struct("!II")
+SEQ_STRUCT = struct.Struct("!I")
+
+# V2X_TxPDU + DB_V2X + Indicator + Sequence Number
+VIDEO_HEADER_LEN = SEQ_OFFSET + SEQ_STRUCT.size
+SEQ_MODULO = 1000000
+
+# Raw video data : Line Number + Row
+LINE_NUM_STRUCT = struct.Struct("!h")
+
+# Band video data : Payload Type + Row Start + Row Count + Frame Width + Frame Height + Row Offset
+#                   + Frame ID + Frame Packets + Stream ID + Band data
+#  (Row Offset : byte offset of raw data in first row, 0 for whole rows)
+#  (Frame Packets : band packets of frame with this Frame ID)
+#  (Stream ID : capture source of sender, sequence numbers / frame ids are counted per stream)
+BAND_HEADER_STRUCT = struct.Struct("!BHHHHHHHB")
+FRAME_ID_STRUCT = struct.Struct("!H")
+FRAME_ID_OFFSET = VIDEO_HEADER_LEN + struct.calcsize("!BHHHHH")
+FRAME_ID_MODULO = 65536
+
+# FEC parity data : First Sequence Number + Group Size + Stream ID + XOR(length + content) of group
+FEC_HEADER_STRUCT = struct.Struct("!IBB")
+
+# Ping feedback (receiver -> sender) : PDR(0.01 %) + Latency(0.1 ms)
+FEEDBACK_STRUCT = struct.Struct("!HH")
+
+
+def tx_pdu_header(length):
+    """ V2X_TxPDU header bytes for payload length """
+    return pack_fields(packet_header_struct.V2X_TxPDU, V2X_TX_PDU_STRUCT, dict(TX_PDU_VALUES, length=length))
+
+
+class VideoHeaderEncoder:
+    """ video packet header : cached constant bytes + patched length, gps, sequence """
+    def __init__(self, indicator=VIDEO_DATA_INDICATOR):
+        """ init """
+        self.template = (tx_pdu_header(0)
+                         + pack_fields(packet_header_struct.DB_V2X, DB_V2X_STRUCT, DB_V2X_VALUES)
+                         + indicator + bytes(SEQ_STRUCT.size))
+        self.buffer = bytearray(self.template)
+
+    def pack_into(self, buffer, offset, data_len, seq, latitude, longitude):
+        """ write header for data_len bytes of video data into buffer[offset:] """
+        buffer[offset:offset + VIDEO_HEADER_LEN] = self.template
+        self.patch_into(buffer, offset, data_len, seq, latitude, longitude)
+
+    def patch_into(self, buffer, offset, data_len, seq, latitude, longitude):
+        """ patch length, gps, sequence of header already written at buffer[offset:] """
+        LENGTH_STRUCT.pack_into(buffer, offset + TX_LENGTH_OFFSET, VIDEO_HEADER_LEN - V2X_TX_PDU_LEN + data_len)
+        GPS_STRUCT.pack_into(buffer, offset + DB_GPS_OFFSET, int(latitude * 1000000), int(longitude * 1000000))
+        SEQ_STRUCT.pack_into(buffer, offset + SEQ_OFFSET, seq)
+
+    def header(self, data_len, seq, latitude, longitude):
+        """ header bytes for data_len bytes of video data """
+        LENGTH_STRUCT.pack_into(self.buffer, TX_LENGTH_OFFSET, VIDEO_HEADER_LEN - V2X_TX_PDU_LEN + data_len)
+        GPS_STRUCT.pack_into(self.buffer, DB_GPS_OFFSET, int(latitude * 1000000), int(longitude * 1000000))
+        SEQ_STRUCT.pack_into(self.buffer, SEQ_OFFSET, seq)
+        return bytes(self.buffer)
+
+    def encode(self, video_data, seq, latitude, longitude):
+        """ header + video_data """
+        LENGTH_STRUCT.pack_into(self.buffer, TX_LENGTH_OFFSET, VIDEO_HEADER_LEN - V2X_TX_PDU_LEN + len(video_data))
+        GPS_STRUCT.pack_into(self.buffer, DB_GPS_OFFSET, int(latitude * 1000000), int(longitude * 1000000))
+        SEQ_STRUCT.pack_into(self.buffer, SEQ_OFFSET, seq)
+        return self.buffer + video_data
+
+
+def show_packet(serialized):
+    """ pretty-print serialized packet by scapy (debug only) """
+    packet_header_struct.V2X_TxPDU(bytes(serialized[:V2X_TX_PDU_LEN])).show()
+    packet_header_struct.DB_V2X(bytes(serialized[V2X_TX_PDU_LEN:V2X_TX_PDU_LEN + DB_V2X_LEN])).show()
@@ -0,0 +1,132 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sensor Sharing Service Forward Error Correction(XOR parity over video packet groups) """
+
+import numpy
+import packet_codec
+from collections import deque
+
+
+# Indicator offset in video header (V2X_TxPDU + DB_V2X + Indicator + Sequence Number)
+INDICATOR_OFFSET = packet_codec.SEQ_OFFSET - len(packet_codec.VIDEO_DATA_INDICATOR)
+FEC_PACKET_HEADER_LEN = packet_codec.VIDEO_HEADER_LEN + packet_codec.FEC_HEADER_STRUCT.size
+FEC_HISTORY = 4096  # received packets kept for recovery
+
+
+class XorFecEncoder:
+    """ one XOR parity packet per group of video packets """
+    def __init__(self, group_size, stream_id=0):
+        """ init """
+        self.group_size = group_size
+        self.stream_id = stream_id
+        self.encoder = packet_codec.VideoHeaderEncoder(packet_codec.VIDEO_FEC_INDICATOR)
+        self.parity_packets = 0
+
+    def protect(self, buffers, seq, latitude, longitude):
+        """ [header, data, ...] of video packets -> parity packet buffers & next sequence number """
+        packets = len(buffers) // 2
+        parity_buffers = []
+        for group_start in range(0, packets, self.group_size):
+            group = range(group_start, min(group_start + self.group_size, packets))
+            # protected content : indicator + (video data after sequence number), length prefixed
+            lengths = [2 + len(buffers[2 * i]) - packet_codec.VIDEO_HEADER_LEN + len(buffers[2 * i + 1]) for i in group]
+            parity = numpy.zeros(2 + max(lengths), dtype=numpy.uint8)
+            for i, length in zip(group, lengths):
+                header = buffers[2 * i]
+                data = buffers[2 * i + 1]
+                extra = len(header) - packet_codec.VIDEO_HEADER_LEN
+                xor_into(parity, 0, packet_codec.LENGTH_STRUCT.pack(length))
+                xor_into(parity, 2, header[INDICATOR_OFFSET:INDICATOR_OFFSET + 2])
+                xor_into(parity, 4, header[packet_codec.VIDEO_HEADER_LEN:])
+                xor_into(parity, 4 + extra, data)
+
+            first_seq = packet_codec.SEQ_STRUCT.unpack_from(buffers[2 * group_start], packet_codec.SEQ_OFFSET)[0]
+            header = bytearray(FEC_PACKET_HEADER_LEN)
+            self.encoder.pack_into(header, 0, packet_codec.FEC_HEADER_STRUCT.size + len(parity), seq, latitude, longitude)
+            packet_codec.FEC_HEADER_STRUCT.pack_into(header, packet_codec.VIDEO_HEADER_LEN, first_seq, len(group),
+                                                     self.stream_id)
+            parity_buffers.append(header)
+            parity_buffers.append(memoryview(parity))
+            seq = (seq + 1) % packet_codec.SEQ_MODULO
+        self.parity_packets = len(parity_buffers) // 2
+        return parity_buffers, seq
+
+
+class XorFecDecoder:
+    """ recover one lost video packet per parity group """
+    def __init__(self, history=FEC_HISTORY):
+        """ init """
+        self.contents = {}  # sequence number -> indicator + video data after sequence number
+        self.order = deque()
+        self.history = history
+        self.active = False  # store packets only after first parity packet
+        self.armed = False   # recover only after first packet stored
+        self.recovered = 0
+        self.unrecoverable = 0
+
+    def add(self, payload):
+        """ keep received video payload for recovery """
+        if not self.active:
+            return
+        self.armed = True
+        seq = packet_codec.SEQ_STRUCT.unpack_from(payload, 2)[0]
+        self.contents[seq] = bytes(payload[0:2]) + bytes(payload[6:])
+        self.order.append(seq)
+        if len(self.order) > self.history:
+            self.contents.pop(self.order.popleft(), None)
+
+    def recover(self, parity_payload):
+        """ parity payload -> recovered video payload (or None) """
+        if not self.armed:
+            self.active = True  # packets of groups before first parity were not kept
+            return None
+        first_seq, count, stream_id = packet_codec.FEC_HEADER_STRUCT.unpack_from(parity_payload, 6)
+        group = [(first_seq + i) % packet_codec.SEQ_MODULO for i in range(count)]
+        missing = [seq for seq in group if seq not in self.contents]
+        if not missing:
+            return None
+        if len(missing) > 1:
+            self.unrecoverable = self.unrecoverable + len(missing)
+            return None
+
+        parity = numpy.frombuffer(parity_payload, dtype=numpy.uint8,
+                                  offset=6 + packet_codec.FEC_HEADER_STRUCT.size).copy()
+        for seq in group:
+            if seq != missing[0]:
+                content = self.contents[seq]
+                if len(content) > len(parity) - 2:
+                    self.unrecoverable = self.unrecoverable + 1
+                    return None
+                xor_into(parity, 0, packet_codec.LENGTH_STRUCT.pack(len(content)))
+                xor_into(parity, 2, content)
+        length = packet_codec.LENGTH_STRUCT.unpack_from(parity, 0)[0]
+        if length < 2 or length > len(parity) - 2:
+            self.unrecoverable = self.unrecoverable + 1
+            return None
+
+        content = parity[2:2 + length].tobytes()
+        self.contents[missing[0]] = content
+        self.order.append(missing[0])
+        self.recovered = self.recovered + 1
+        return content[0:2] + packet_codec.SEQ_STRUCT.pack(missing[0]) + content[2:]
+
+
+def xor_into(parity, offset, data):
+    """ parity[offset:offset + len(data)] ^= data """
+    if len(data) == 0:
+        return
+    target = parity[offset:offset + len(data)]
+    numpy.bitwise_xor(target, numpy.frombuffer(data, dtype=numpy.uint8), out=target)
@@ -0,0 +1,138 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sensor Sharing Service Adaptive Rate Controller(receiver feedback driven) """
+
+import os
+import csv
+import datetime as dt
+
+
+# Rate levels : (frame width, frame height, frame interval msec, codec quality), highest rate first
+RATE_LEVELS = [
+    (300, 300, 120, 80),
+    (300, 300, 160, 70),
+    (240, 240, 160, 60),
+    (240, 240, 240, 50),
+    (180, 180, 240, 40),
+    (120, 120, 320, 30),
+]
+
+# Thresholds
+PDR_LOW = 80.0       # % : step down below
+PDR_HIGH = 95.0      # % : step up above
+LATENCY_HIGH = 50.0  # ms : step down above
+DOWN_REPORTS = 2     # consecutive bad reports before stepping down
+UP_REPORTS = 5       # consecutive good reports before stepping up
+
+
+def default_log_path():
+    """ ./yyyy.mm.dd/ETRI_OBU_(TX)_rate_<time>.csv """
+    now = dt.datetime.now()
+    folder_name = now.strftime('%Y.%m.%d')
+    try:
+        if not os.path.exists(folder_name):
+            os.makedirs(folder_name)
+    except OSError:
+        print('Error:Cannot creat directory.' + folder_name)
+    return './' + folder_name + '/ETRI_OBU_(TX)_rate_' + now.strftime('%Y.%m.%d.%H.%M.%S') + '.csv'
+
+
+class RateController:
+    """ adjust resolution, frame interval, quality by receiver PDR & latency (with hysteresis) """
+    def __init__(self, levels=RATE_LEVELS, log_path=None):
+        """ init """
+        self.levels = levels
+        self.level = 0
+        self.bad_reports = 0
+        self.good_reports = 0
+        self.reports = 0
+        self.last_pdr = 0.0
+        self.last_latency = 0.0
+        self.log_file = None
+        self.log_writer = None
+        if log_path is not None:
+            self.log_file = open(log_path, 'w', encoding='utf-8', newline='')
+            self.log_writer = csv.writer(self.log_file)
+            self.log_writer.writerow(['Time', 'PDR', 'Latency', 'Decision', 'Level',
+                                      'Width', 'Height', 'Frame Msec', 'Quality'])
+
+    @property
+    def frame_width(self):
+        """ current frame width """
+        return self.levels[self.level][0]
+
+    @property
+    def frame_height(self):
+        """ current frame height """
+        return self.levels[self.level][1]
+
+    @property
+    def frame_msec(self):
+        """ current frame interval """
+        return self.levels[self.level][2]
+
+    @property
+    def quality(self):
+        """ current codec quality """
+        return self.levels[self.level][3]
+
+    def update(self, pdr, latency):
+        """ receiver feedback (PDR %, latency ms) -> decision """
+        self.reports = self.reports + 1
+        self.last_pdr = pdr
+        self.last_latency = latency
+
+        if pdr < PDR_LOW or latency > LATENCY_HIGH:
+            self.bad_reports = self.bad_reports + 1
+            self.good_reports = 0
+        elif pdr >= PDR_HIGH and latency <= LATENCY_HIGH / 2:
+            self.good_reports = self.good_reports + 1
+            self.bad_reports = 0
+        else:
+            self.bad_reports = 0
+            self.good_reports = 0
+
+        decision = "hold"
+        if self.bad_reports >= DOWN_REPORTS and self.level < len(self.levels) - 1:
+            self.level = self.level + 1
+            self.bad_reports = 0
+            decision = "down"
+        elif self.good_reports >= UP_REPORTS and self.level > 0:
+            self.level = self.level - 1
+            self.good_reports = 0
+            decision = "up"
+        self.log(decision)
+        return decision
+
+    def log(self, decision):
+        """ write decision to log file """
+        if self.log_writer is None:
+            return
+        try:
+            self.log_writer.writerow([dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f'),
+                                      "{:.2f}".format(self.last_pdr), "{:.2f}".format(self.last_latency),
+                                      decision, self.level, self.frame_width, self.frame_height,
+                                      self.frame_msec, self.quality])
+            self.log_file.flush()
+        except BaseException:
+            self.log_writer = None
+
+    def close(self):
+        """ close log file """
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+            self.log_writer = None
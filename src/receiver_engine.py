@@ -0,0 +1,318 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sensor Sharing Service Receiver Engine(asyncio, without Qt) """
+
+import sys
+import time
+import queue
+import asyncio
+import argparse
+import threading
+import traceback
+from datetime import datetime
+import receiver_frame
+import receiver_stream
+
+
+# Socket Value
+DEVICE_ADDR = '192.168.1.11'
+DEVICE_PORT = 47347
+WS_REQ = b"\xf1\xf1\x00\x01\x00\x00\x00\x00\x00\x00\x14\x97\x00\x00\x00\x00"
+WS_RESP_MAGIC_NUM = b'\xf1\xf2'
+HANDSHAKE_TIMEOUT = 1.0  # seconds, WS request sent again after
+
+# Receive Frame Size
+RECV_FRAME_WIDTH = 300
+RECV_FRAME_HEIGHT = 300
+
+PING_INTERVAL = 1         # seconds (RTT_TIMER of receiver window)
+METRIC_INTERVAL = 1       # seconds between metric snapshots
+DECODE_IDLE_SLEEP = 0.002  # seconds, decode loop without queued bands
+EVENT_QUEUE_SIZE = 64     # metric snapshots kept for consumer (oldest dropped)
+
+
+def collect_stats(streams, framer):
+    """ per-stream & framer statistics since last call (resets counters) """
+    result = {"framer": framer.stats(), "streams": {}}
+    for stream_id in sorted(streams):
+        stream = streams[stream_id]
+        fec_decoder = stream.fec_decoder
+        stream_stats = stream.stream_stats.stats()
+        stream_stats.update(stream.band_decoder.stats())
+        stream_stats["frame"] = stream.frame_assembler.stats()
+        stream_stats["store"] = stream.frame_store.stats()
+        stream_stats["rows_per_frame"] = stream.row_update_counter.last_frame_rows
+        stream_stats["fec_active"] = fec_decoder.active
+        # FEC recovered / unrecoverable packets since last call
+        stream_stats["fec_recovered"] = fec_decoder.recovered - stream.fec_counts[0]
+        stream_stats["fec_unrecoverable"] = fec_decoder.unrecoverable - stream.fec_counts[1]
+        stream.fec_counts = (fec_decoder.recovered, fec_decoder.unrecoverable)
+        result["streams"][stream_id] = stream_stats
+    return result
+
+
+class ReceiverProtocol(asyncio.BufferedProtocol):
+    """ OBU stream -> engine (bytes received straight into framer buffer) """
+    def __init__(self, engine):
+        """ init """
+        self.engine = engine
+
+    def get_buffer(self, sizehint):
+        """ free space of framer buffer """
+        return self.engine.framer.writable()
+
+    def buffer_updated(self, nbytes):
+        """ bytes received """
+        self.engine.received(nbytes)
+
+    def connection_lost(self, exc):
+        """ OBU closed connection """
+        self.engine.connection_lost(exc)
+
+
+class ReceiverEngine:
+    """ OBU connection, handshake, receive framing, ping & metric ticks as coroutines on one event loop """
+    def __init__(self, addr=DEVICE_ADDR, port=DEVICE_PORT, frame_width=RECV_FRAME_WIDTH,
+                 frame_height=RECV_FRAME_HEIGHT, handshake=True, ping_interval=PING_INTERVAL,
+                 metric_interval=METRIC_INTERVAL, seq_sink=None, header_sink=None, store_factory=None,
+                 tick_sink=None):
+        """ init (seq_sink : sequence numbers of stream 0,
+                  header_sink(header, time_ns) : V2X_RxPDU + DB_V2X bytes & receive time(time.monotonic_ns()),
+                  store_factory : stream id -> frame store, tick_sink : metric snapshots on event loop thread) """
+        self.addr = addr
+        self.port = port
+        self.handshake = handshake
+        self.ping_interval = ping_interval
+        self.metric_interval = metric_interval
+        self.header_sink = header_sink
+        self.tick_sink = tick_sink
+        # stream 0 shown from start, other streams added on first packet
+        self.streams = {}
+        self.video_receiver = receiver_frame.VideoReceiver(frame_height, frame_width, self.streams, seq_sink,
+                                                           store_factory)
+        self.video_receiver.stream(0)
+        self.framer = receiver_stream.StreamFramer()
+        self.transport = None
+        self.handshaken = not handshake  # set by received() when WS response arrives
+        self.latency = 0.0  # ms, last ping
+        self.pdr = 0.0      # %, stream 0 at last metric tick (ping feedback)
+        self.sender_position = (0.0, 0.0)
+        # results for other threads : latest snapshot(lock) & queue of snapshots
+        self.lock = threading.Lock()
+        self.latest = {}
+        self.events = queue.Queue(EVENT_QUEUE_SIZE)
+        self.loop = None
+        self.stop_event = None
+        self.stop_requested = threading.Event()  # stop() before run() has set up event loop
+        self.handshake_event = None
+        self.thread = None
+
+    async def run(self, duration=0):
+        """ connect & run until stop / connection lost / duration(seconds, 0 : no limit) """
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        self.handshake_event = asyncio.Event()
+        if self.stop_requested.is_set():
+            return
+        try:
+            self.transport, _ = await self.loop.create_connection(lambda: ReceiverProtocol(self), self.addr,
+                                                                  self.port)
+        except OSError as error:
+            self.publish({"error": "cannot connect {}:{} : {}".format(self.addr, self.port, error),
+                          "time": time.time()})
+            return
+        tasks = []
+        try:
+            if self.handshake:
+                await self.do_handshake()
+            tasks = [asyncio.ensure_future(self.ping_loop()), asyncio.ensure_future(self.metric_loop()),
+                     asyncio.ensure_future(self.decode_loop())]
+            if duration > 0:
+                try:
+                    await asyncio.wait_for(self.stop_event.wait(), duration)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await self.stop_event.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.transport.close()
+
+    async def do_handshake(self):
+        """ WS request until OBU response """
+        while not self.handshake_event.is_set() and not self.stop_event.is_set():
+            self.transport.write(WS_REQ)
+            try:
+                await asyncio.wait_for(self.handshake_event.wait(), HANDSHAKE_TIMEOUT)
+            except asyncio.TimeoutError:
+                continue
+
+    def received(self, nbytes):
+        """ received bytes in framer buffer -> messages (event loop) """
+        if not self.handshaken:
+            # WS response (and anything before it) is not RX message stream, RX messages may follow in same read
+            data = self.framer.peek(nbytes)
+            response = data.find(WS_RESP_MAGIC_NUM)
+            if response < 0:
+                self.framer.discard(nbytes)
+                return
+            rx_start = data.find(receiver_stream.RX_MAGIC_NUM, response + len(WS_RESP_MAGIC_NUM))
+            if rx_start < 0:
+                rx_start = nbytes
+            self.framer.discard(rx_start)
+            self.handshaken = True
+            self.handshake_event.set()
+            nbytes = nbytes - rx_start
+            if nbytes == 0:
+                return
+
+        receive_time = int(datetime.now().strftime("%S%f"))
+        receive_ns = time.monotonic_ns()
+        chunk, offsets, lengths = self.framer.commit(nbytes)
+        if len(offsets) == 0:
+            return
+        headers = receiver_stream.decode_headers(chunk, offsets, lengths)
+        video = ~headers["ping"]
+        if video.any():
+            self.sender_position = (float(headers["latitude"][video][-1]), float(headers["longitude"][video][-1]))
+        for offset, length, seq, ping in zip(offsets.tolist(), lengths.tolist(), headers["seq"].tolist(),
+                                             headers["ping"].tolist()):
+            try:
+                message = chunk[offset:offset + length]
+                if ping:
+                    self.latency = receiver_stream.ping_latency(message[38:], receive_time)
+                    continue
+                if self.header_sink is not None:
+                    self.header_sink(bytes(message[0:receiver_stream.RX_PAYLOAD_OFFSET]), receive_ns)
+                self.video_receiver.add(message[receiver_stream.RX_PAYLOAD_OFFSET:], seq)
+            except BaseException:
+                print(traceback.format_exc())
+
+    def connection_lost(self, exc):
+        """ stop engine when OBU connection is closed """
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+    async def ping_loop(self):
+        """ ping request (with PDR / latency feedback) every ping interval """
+        while True:
+            self.transport.write(receiver_stream.ping_request(self.pdr, self.latency))
+            await asyncio.sleep(self.ping_interval)
+
+    async def metric_loop(self):
+        """ metric snapshot every metric interval """
+        while True:
+            await asyncio.sleep(self.metric_interval)
+            try:
+                self.tick()
+            except BaseException:
+                print(traceback.format_exc())
+
+    async def decode_loop(self):
+        """ decode compressed bands & publish timed-out frames (decoding runs in executor thread) """
+        while True:
+            decoded = await self.loop.run_in_executor(None, self.decode_pending)
+            if decoded == 0:
+                await asyncio.sleep(DECODE_IDLE_SLEEP)
+
+    def decode_pending(self):
+        """ decode queued bands of every stream, return number of decoded bands """
+        decoded = 0
+        for stream in list(self.streams.values()):
+            decoded = decoded + stream.band_decoder.decode_pending()
+            stream.frame_assembler.poll()
+        return decoded
+
+    def tick(self):
+        """ collect statistics into new snapshot """
+        snapshot = collect_stats(self.streams, self.framer)
+        self.pdr = snapshot["streams"][0]["pdr"] if 0 in snapshot["streams"] else 0.0
+        snapshot["time"] = time.time()
+        snapshot["latency_ms"] = self.latency
+        snapshot["sender_position"] = self.sender_position
+        self.publish(snapshot)
+
+    def publish(self, snapshot):
+        """ snapshot -> latest, tick sink & events queue (error snapshot : {"error", "time"} only) """
+        with self.lock:
+            self.latest = snapshot
+        if self.tick_sink is not None:
+            self.tick_sink(snapshot)
+        if self.events.full():
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                pass
+        self.events.put_nowait(snapshot)
+
+    def snapshot(self):
+        """ latest metric snapshot (any thread, snapshot is not changed after publish) """
+        with self.lock:
+            return self.latest
+
+    def start(self, duration=0):
+        """ run engine on own event loop thread (for Qt UI) """
+        self.thread = threading.Thread(target=asyncio.run, args=(self.run(duration),), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """ stop engine (any thread) """
+        self.stop_requested.set()
+        if self.loop is not None and self.stop_event is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+        if self.thread is not None:
+            self.thread.join(1)
+
+
+def main(argv=None):
+    """ receive & print metric snapshots without GUI """
+    parser = argparse.ArgumentParser(description="Sensor sharing service receiver without GUI")
+    parser.add_argument("--addr", default=DEVICE_ADDR)
+    parser.add_argument("--port", type=int, default=DEVICE_PORT)
+    parser.add_argument("--no-handshake", action="store_true", help="skip OBU WS request")
+    parser.add_argument("--width", type=int, default=RECV_FRAME_WIDTH)
+    parser.add_argument("--height", type=int, default=RECV_FRAME_HEIGHT)
+    parser.add_argument("--duration", type=float, default=0, help="seconds, 0 : until connection closed / Ctrl+C")
+    args = parser.parse_args(argv)
+
+    engine = ReceiverEngine(args.addr, args.port, args.width, args.height, not args.no_handshake)
+    engine.start(args.duration)
+    try:
+        while engine.thread.is_alive() or not engine.events.empty():
+            try:
+                snapshot = engine.events.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if "error" in snapshot:
+                print(snapshot["error"])
+                continue
+            framer = snapshot["framer"]
+            print("{:.0f} messages/s  resyncs {}  discarded {} bytes  latency {:.2f} ms".format(
+                framer["messages_per_sec"], framer["resyncs"], framer["discarded_bytes"], snapshot["latency_ms"]))
+            for stream_id, stream in snapshot["streams"].items():
+                print("    stream {} : PDR {:.1f} %  {:.2f} Mbps  {:.1f} fps  completeness {:.1f} %  gen {}".format(
+                    stream_id, stream["pdr"], stream["throughput_mbps"], stream["store"]["published_per_sec"],
+                    stream["frame"]["completeness"], stream["store"]["generation"]))
+    except KeyboardInterrupt:
+        pass
+    engine.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,501 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sensor Sharing Service Receive Frame Processing(band decoding) """
+
+import time
+import struct
+import threading
+import traceback
+import cv2
+import numpy
+import packet_codec
+import packet_fec
+from collections import deque
+
+
+FRAME_TIMEOUT = 0.2  # seconds from first packet, publish incomplete frame after timeout
+
+
+def decode_band(payload_type, data, width):
+    """ band data -> band rows (row_count, width, 3) """
+    if payload_type == packet_codec.PAYLOAD_TYPE_RAW:
+        return numpy.frombuffer(data, dtype=numpy.uint8).reshape(-1, width, 3)
+    band = cv2.imdecode(numpy.frombuffer(data, dtype=numpy.uint8), cv2.IMREAD_COLOR)
+    if band is None:
+        raise ValueError("imdecode failed : payload type " + str(payload_type))
+    return band
+
+
+class RowUpdateCounter:
+    """ rows updated per frame (rows arrive in ascending order within a frame) """
+    def __init__(self):
+        """ init """
+        self.last_position = (-1, -1)  # (row start, row offset)
+        self.last_row_end = -1
+        self.frame_rows = 0
+        self.last_frame_rows = 0
+
+    def update(self, row_start, row_count, row_offset=0, recovered=False, partial_end=False):
+        """ count received rows (recovered : late FEC-recovered rows of current frame, no boundary check,
+            partial_end : last row continued in next packet) """
+        if recovered:
+            # rows shared with neighbouring packets were counted by them
+            shared = (1 if row_offset > 0 else 0) + (1 if partial_end else 0)
+            self.frame_rows = self.frame_rows + max(row_count - shared, 0)
+            return
+        if (row_start, row_offset) <= self.last_position:
+            self.last_frame_rows = self.frame_rows
+            self.frame_rows = 0
+            self.last_row_end = -1
+        self.last_position = (row_start, row_offset)
+        last_row_end = self.last_row_end
+        self.last_row_end = row_start + row_count - 1
+        if row_offset > 0 and row_start == last_row_end:
+            row_count = row_count - 1  # row fragment continued from previous packet
+        self.frame_rows = self.frame_rows + row_count
+
+
+class FrameStore:
+    """ double-buffered frame : rows written into back buffer, publish copies rows of frame to front buffer
+        (new generation) """
+    def __init__(self, height, width, front=None, generation=None, lock=None):
+        """ init (front, generation, lock : shared memory views & process lock when viewer is in other process) """
+        self.back = numpy.zeros((height, width, 3), numpy.uint8)  # rows written by receive / decode threads
+        # frame shown by viewer, changed only by publish
+        self.front = front if front is not None else numpy.zeros((height, width, 3), numpy.uint8)
+        self.generation = generation if generation is not None else numpy.zeros(1, numpy.int64)  # [generation]
+        self.lock = lock if lock is not None else threading.Lock()  # hold while writing / reading front buffer
+        # statistics since last stats()
+        self.published = 0
+        self.rendered = 0
+        self.skipped = 0
+        self.stats_time = time.perf_counter()
+
+    def publish(self, rows=None):
+        """ back buffer rows(bool mask, all if None) -> front buffer (back buffer keeps rows for next frame) """
+        with self.lock:
+            if rows is None:
+                numpy.copyto(self.front, self.back)
+            else:
+                numpy.copyto(self.front, self.back, where=rows[:, None, None])
+            self.generation[0] = self.generation[0] + 1
+            self.published = self.published + 1
+
+    def read(self, generation, out):
+        """ front buffer -> out(RGB) if newer than generation, return generation of out """
+        with self.lock:
+            if self.generation[0] == generation:
+                self.skipped = self.skipped + 1
+                return generation
+            cv2.cvtColor(self.front, cv2.COLOR_BGR2RGB, dst=out)
+            self.rendered = self.rendered + 1
+            return int(self.generation[0])
+
+    def stats(self):
+        """ published / rendered frames/s, skipped renders(front buffer unchanged) since last call """
+        with self.lock:
+            now = time.perf_counter()
+            elapsed = now - self.stats_time
+            result = {
+                "published_per_sec": self.published / elapsed if elapsed > 0 else 0.0,
+                "rendered_per_sec": self.rendered / elapsed if elapsed > 0 else 0.0,
+                "skipped_renders": self.skipped,
+                "generation": int(self.generation[0]),
+            }
+            self.published = 0
+            self.rendered = 0
+            self.skipped = 0
+            self.stats_time = now
+        return result
+
+
+class FrameAssembler:
+    """ per-frame row bitmap, publish completed(or timed-out) frames of back buffer to front buffer
+        (writers hold lock while writing back buffer rows & adding them, so publish never sees rows half written) """
+    def __init__(self, store, timeout=FRAME_TIMEOUT):
+        """ init """
+        self.store = store
+        self.timeout = timeout
+        self.lock = threading.RLock()
+        # back buffer row -> frame id of last rows written (-1 : same as front buffer)
+        self.row_owner = numpy.full(store.back.shape[0], -1, numpy.int32)
+        self.frames = {}  # frame id -> [row bitmap, received packets, frame packets, first packet time]
+        self.row_frame_id = 0  # frame id of raw row packets(no frame id in packet)
+        self.last_row = -1
+        self.row_frames = {}  # raw row frame id -> [first seq, last seq, first row, last row] of received rows
+        # statistics since last stats()
+        self.published = 0
+        self.completed = 0
+        self.dropped = 0  # superseded by newer frame before publish
+        self.completeness_sum = 0.0
+        self.latency_sum = 0.0
+        self.stats_time = time.perf_counter()
+
+    def add(self, frame_id, row_start, row_count, frame_height, frame_packets=0):
+        """ rows of frame written in canvas (frame_packets 0 : frame complete when all rows written) """
+        now = time.perf_counter()
+        with self.lock:
+            state = self.frames.get(frame_id)
+            if state is None:
+                state = [numpy.zeros(frame_height, dtype=bool), 0, frame_packets, now]
+                self.frames[frame_id] = state
+            state[0][row_start:row_start + row_count] = True
+            state[1] = state[1] + 1
+            # same row mapping as BandDecoder.write_band (frame height of sender may differ)
+            height = len(self.row_owner)
+            self.row_owner[row_start * height // frame_height:
+                           min((row_start + row_count) * height // frame_height, height)] = frame_id
+            if (state[2] > 0 and state[1] >= state[2]) or (state[2] == 0 and state[0].all()):
+                self.publish(frame_id, now)
+            self.expire(now)
+
+    def add_row(self, row, frame_height, seq=0, recovered=False):
+        """ raw row packet (frame boundary when row number goes back,
+            recovered : FEC-recovered row arriving late, frame found by sequence number) """
+        with self.lock:
+            if recovered:
+                frame_id = self.row_frame_of(seq, row)
+                if frame_id is not None:
+                    self.add(frame_id, row, 1, frame_height)
+                return
+            if row <= self.last_row:
+                self.row_frame_id = (self.row_frame_id + 1) % packet_codec.FRAME_ID_MODULO
+            self.last_row = row
+            span = self.row_frames.get(self.row_frame_id)
+            if span is None:
+                self.row_frames[self.row_frame_id] = [seq, seq, row, row]
+            else:
+                span[1] = seq
+                span[3] = row
+            self.add(self.row_frame_id, row, 1, frame_height)
+
+    def row_frame_of(self, seq, row):
+        """ pending raw row frame of recovered row, None if its frame was already published (lock held) """
+        before = None  # (seq distance, frame id, last row) of nearest frame received before seq
+        after = None   # (seq distance, frame id, first row) of nearest frame received after seq
+        for frame_id, (first_seq, last_seq, first_row, last_row) in self.row_frames.items():
+            offset = (seq - first_seq) % packet_codec.SEQ_MODULO
+            if offset < packet_codec.SEQ_MODULO // 2:
+                span = (last_seq - first_seq) % packet_codec.SEQ_MODULO
+                if offset <= span:
+                    return frame_id
+                if before is None or offset - span < before[0]:
+                    before = (offset - span, frame_id, last_row)
+            else:
+                distance = packet_codec.SEQ_MODULO - offset
+                if after is None or distance < after[0]:
+                    after = (distance, frame_id, first_row)
+        # between frames : trailing row of frame before, or leading row of frame after
+        if before is not None and row > before[2]:
+            return before[1]
+        if after is not None and row < after[2]:
+            return after[1]
+        return None
+
+    def poll(self):
+        """ publish timed-out frames without new packets """
+        with self.lock:
+            self.expire(time.perf_counter())
+
+    def expire(self, now):
+        """ publish frames older than timeout (lock held) """
+        for frame_id in [frame_id for frame_id, state in self.frames.items() if now - state[3] >= self.timeout]:
+            if frame_id in self.frames:
+                self.publish(frame_id, now)
+
+    def publish(self, frame_id, now):
+        """ publish back buffer of frame store (lock held) """
+        state = self.frames.pop(frame_id)
+        self.row_frames.pop(frame_id, None)
+        frame_ids = [frame_id]
+        # frames started before this frame will be overwritten, their rows go out with this frame
+        for old_id in [old_id for old_id, old in self.frames.items() if old[3] < state[3]]:
+            self.row_frames.pop(old_id, None)
+            self.completeness_sum = self.completeness_sum + frame_completeness(self.frames.pop(old_id))
+            self.dropped = self.dropped + 1
+            frame_ids.append(old_id)
+        completeness = frame_completeness(state)
+        # rows of newer frames already written into back buffer stay until their frame is published
+        rows = numpy.isin(self.row_owner, frame_ids)
+        self.store.publish(rows)
+        self.row_owner[rows] = -1
+        self.published = self.published + 1
+        if completeness >= 1.0:
+            self.completed = self.completed + 1
+        self.completeness_sum = self.completeness_sum + completeness
+        self.latency_sum = self.latency_sum + now - state[3]
+
+    def stats(self):
+        """ completeness %, frames/s, assembly latency since last call """
+        with self.lock:
+            now = time.perf_counter()
+            frames = self.published + self.dropped
+            result = {
+                "frames_per_sec": self.published / (now - self.stats_time) if now > self.stats_time else 0.0,
+                "completeness": self.completeness_sum * 100 / frames if frames else 0.0,
+                "latency_ms": self.latency_sum * 1000 / self.published if self.published else 0.0,
+                "complete_frames": self.completed,
+                "published_frames": self.published,
+                "dropped_frames": self.dropped,
+            }
+            self.published = 0
+            self.completed = 0
+            self.dropped = 0
+            self.completeness_sum = 0.0
+            self.latency_sum = 0.0
+            self.stats_time = now
+        return result
+
+
+def frame_completeness(state):
+    """ received packets / frame packets (rows received / frame rows if frame packets unknown) """
+    if state[2] > 0:
+        return min(state[1] / state[2], 1.0)
+    return numpy.count_nonzero(state[0]) / len(state[0])
+
+
+class BandDecoder:
+    """ decode received band payloads into frame (worker thread side) """
+    def __init__(self, frame, assembler=None):
+        """ init """
+        self.frame = frame
+        self.assembler = assembler
+        # held while writing frame rows & adding them to assembler
+        self.lock = assembler.lock if assembler is not None else threading.Lock()
+        self.band_q = deque()
+        self.decode_time = 0.0   # seconds, current frame
+        self.frame_bytes = 0     # band data bytes, current frame
+        self.last_decode_time = 0.0
+        self.last_frame_bytes = 0
+        self.decode_errors = 0
+        self.last_position = (-1, -1)  # (row start, row offset)
+        self.staging = None  # raw frame of sender size (when different from frame)
+
+    def push(self, payload, recovered=False):
+        """ queue band payload (indicator + sequence + band header + data, recovered : by FEC) """
+        self.band_q.append((bytes(payload), recovered))
+
+    def frame_boundary(self, row_start, row_offset, recovered=False):
+        """ close frame statistics when band position goes back (recovered : late band of current frame, no check) """
+        if recovered:
+            return
+        if (row_start, row_offset) <= self.last_position:
+            self.last_decode_time = self.decode_time
+            self.last_frame_bytes = self.frame_bytes
+            self.decode_time = 0.0
+            self.frame_bytes = 0
+        self.last_position = (row_start, row_offset)
+
+    def scatter(self, payload, recovered=False):
+        """ raw band payload -> frame by one vectorized assignment (receive thread side, recovered : by FEC) """
+        payload_type, row_start, row_count, frame_width, frame_height, row_offset, frame_id, frame_packets, _ = \
+            packet_codec.BAND_HEADER_STRUCT.unpack_from(payload, 6)
+        data = numpy.frombuffer(payload, dtype=numpy.uint8, offset=6 + packet_codec.BAND_HEADER_STRUCT.size)
+        self.frame_boundary(row_start, row_offset, recovered)
+
+        start_time = time.perf_counter()
+        with self.lock:
+            try:
+                row_len = frame_width * 3
+                position = row_start * row_len + row_offset
+                if frame_width == self.frame.shape[1] and frame_height == self.frame.shape[0]:
+                    self.frame.reshape(-1)[position:position + len(data)] = data
+                else:
+                    if self.staging is None or self.staging.shape != (frame_height, frame_width, 3):
+                        self.staging = numpy.zeros((frame_height, frame_width, 3), numpy.uint8)
+                    self.staging.reshape(-1)[position:position + len(data)] = data
+                    self.write_band(self.staging[row_start:row_start + row_count], row_start, frame_width,
+                                    frame_height)
+            except BaseException:
+                self.decode_errors = self.decode_errors + 1
+            self.decode_time = self.decode_time + time.perf_counter() - start_time
+            if self.assembler is not None:
+                self.assembler.add(frame_id, row_start, row_count, frame_height, frame_packets)
+        self.frame_bytes = self.frame_bytes + len(data)
+
+    def decode_pending(self):
+        """ decode all queued bands, return number of decoded bands """
+        count = 0
+        while self.band_q:
+            payload, recovered = self.band_q.popleft()
+            payload_type, row_start, row_count, frame_width, frame_height, row_offset, frame_id, frame_packets, _ = \
+                packet_codec.BAND_HEADER_STRUCT.unpack_from(payload, 6)
+            data = memoryview(payload)[6 + packet_codec.BAND_HEADER_STRUCT.size:]
+            self.frame_boundary(row_start, row_offset, recovered)
+
+            start_time = time.perf_counter()
+            try:
+                band = decode_band(payload_type, data, frame_width)
+            except BaseException:
+                band = None
+                self.decode_errors = self.decode_errors + 1
+            with self.lock:
+                if band is not None:
+                    try:
+                        self.write_band(band, row_start, frame_width, frame_height)
+                    except BaseException:
+                        self.decode_errors = self.decode_errors + 1
+                if self.assembler is not None:
+                    self.assembler.add(frame_id, row_start, row_count, frame_height, frame_packets)
+            self.decode_time = self.decode_time + time.perf_counter() - start_time
+            self.frame_bytes = self.frame_bytes + len(data)
+            count = count + 1
+        return count
+
+    def write_band(self, band, row_start, frame_width, frame_height):
+        """ write band rows into frame (scaled when sender frame size differs) """
+        if frame_width == self.frame.shape[1] and frame_height == self.frame.shape[0]:
+            row_end = min(row_start + band.shape[0], self.frame.shape[0])
+            self.frame[row_start:row_end] = band[:row_end - row_start]
+            return
+        row_begin = row_start * self.frame.shape[0] // frame_height
+        row_end = min((row_start + band.shape[0]) * self.frame.shape[0] // frame_height, self.frame.shape[0])
+        if row_end > row_begin:
+            self.frame[row_begin:row_end] = cv2.resize(band, (self.frame.shape[1], row_end - row_begin),
+                                                       interpolation=cv2.INTER_LINEAR)
+
+    def stats(self):
+        """ decode time & bytes of last complete frame """
+        return {
+            "decode_ms": self.last_decode_time * 1000,
+            "frame_bytes": self.last_frame_bytes,
+            "decode_errors": self.decode_errors,
+        }
+
+
+class StreamStats:
+    """ packet delivery ratio & throughput of one stream (from sequence numbers) """
+    def __init__(self):
+        """ init """
+        self.last_seq = None
+        self.expected = 0  # sequence numbers passed since last stats()
+        self.packets = 0
+        self.bytes = 0
+        self.stats_time = time.perf_counter()
+
+    def add(self, seq, nbytes):
+        """ count received packet """
+        if self.last_seq is None:
+            self.expected = self.expected + 1
+            self.last_seq = seq
+        else:
+            delta = (seq - self.last_seq) % packet_codec.SEQ_MODULO
+            if 0 < delta < packet_codec.SEQ_MODULO // 2:  # ignore duplicated / reordered packet
+                self.expected = self.expected + delta
+                self.last_seq = seq
+        self.packets = self.packets + 1
+        self.bytes = self.bytes + nbytes
+
+    def stats(self):
+        """ pdr %, throughput Mbps since last call """
+        now = time.perf_counter()
+        result = {
+            "pdr": min(self.packets * 100 / self.expected, 100.0) if self.expected else 0.0,
+            "throughput_mbps": self.bytes * 8 / (now - self.stats_time) / 1000000 if now > self.stats_time else 0.0,
+            "packets": self.packets,
+        }
+        self.expected = 0
+        self.packets = 0
+        self.bytes = 0
+        self.stats_time = now
+        return result
+
+
+class VideoStream:
+    """ receive state of one sender stream : frame buffers, assembler, decoder, fec, statistics """
+    def __init__(self, stream_id, height, width, frame_store=None):
+        """ init """
+        self.stream_id = stream_id
+        # rows are written into back buffer(recv_frame), frame assembler publishes whole frames to front buffer
+        self.frame_store = frame_store if frame_store is not None else FrameStore(height, width)
+        self.recv_frame = self.frame_store.back
+        self.frame_assembler = FrameAssembler(self.frame_store)
+        self.band_decoder = BandDecoder(self.recv_frame, self.frame_assembler)
+        self.fec_decoder = packet_fec.XorFecDecoder()
+        self.row_update_counter = RowUpdateCounter()
+        self.stream_stats = StreamStats()
+        self.fec_counts = (0, 0)  # (recovered, unrecoverable) at last statistics
+
+
+class VideoReceiver:
+    """ video payloads -> per-stream frames (stream demux, FEC recovery, band / row writing, statistics) """
+    def __init__(self, height, width, streams=None, seq_sink=None, store_factory=None):
+        """ init (seq_sink : called with sequence numbers of stream 0, store_factory : stream id -> FrameStore) """
+        self.height = height
+        self.width = width
+        self.streams = streams if streams is not None else {}  # stream id -> VideoStream (added on first packet)
+        self.seq_sink = seq_sink
+        self.store_factory = store_factory
+
+    def stream(self, stream_id):
+        """ receive state of stream (created on first packet) """
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            frame_store = self.store_factory(stream_id) if self.store_factory is not None else None
+            stream = VideoStream(stream_id, self.height, self.width, frame_store)
+            self.streams[stream_id] = stream
+        return stream
+
+    def add(self, payload, seq):
+        """ received video payload (indicator ~) -> frame, False if not video payload """
+        indicator = payload[0:2]
+        if indicator == packet_codec.VIDEO_FEC_INDICATOR:
+            stream = self.stream(payload[6 + packet_codec.FEC_HEADER_STRUCT.size - 1])
+            self.count_packet(stream, seq, len(payload))
+            recovered_payload = stream.fec_decoder.recover(payload)
+            if recovered_payload is not None:
+                self.process_video(stream, recovered_payload, recovered=True)
+        elif indicator == packet_codec.VIDEO_BAND_INDICATOR or indicator == packet_codec.VIDEO_DATA_INDICATOR:
+            stream = self.stream(payload[6 + packet_codec.BAND_HEADER_STRUCT.size - 1]
+                                 if indicator == packet_codec.VIDEO_BAND_INDICATOR else 0)
+            self.count_packet(stream, seq, len(payload))
+            stream.fec_decoder.add(payload)
+            self.process_video(stream, payload)
+        else:
+            return False
+        return True
+
+    def count_packet(self, stream, seq, nbytes):
+        """ per-stream pdr & throughput """
+        stream.stream_stats.add(seq, nbytes)
+        if stream.stream_id == 0 and self.seq_sink is not None:
+            self.seq_sink(seq)
+
+    def process_video(self, stream, payload, recovered=False):
+        """ write video payload(received or recovered by FEC) into frame of stream """
+        if payload[0:2] == packet_codec.VIDEO_BAND_INDICATOR:
+            band_header = packet_codec.BAND_HEADER_STRUCT.unpack_from(payload, 6)
+            partial_end = False
+            if band_header[0] == packet_codec.PAYLOAD_TYPE_RAW:
+                stream.band_decoder.scatter(payload, recovered)
+                data_len = len(payload) - 6 - packet_codec.BAND_HEADER_STRUCT.size
+                partial_end = (band_header[5] + data_len) % (band_header[3] * 3) != 0
+            else:
+                stream.band_decoder.push(payload, recovered)
+            stream.row_update_counter.update(band_header[1], band_header[2], band_header[5], recovered=recovered,
+                                             partial_end=partial_end)
+        else:
+            try:
+                seq = packet_codec.SEQ_STRUCT.unpack_from(payload, 2)[0]
+                frame_line_num = struct.unpack(">h", payload[6:8])[0]
+                frame_line_data = numpy.frombuffer(payload[8:], dtype=numpy.uint8)
+                frame_line_data = numpy.reshape(frame_line_data, (self.width, -1))
+                with stream.frame_assembler.lock:
+                    stream.recv_frame[frame_line_num] = frame_line_data
+                    stream.frame_assembler.add_row(frame_line_num, self.height, seq, recovered)
+                stream.row_update_counter.update(frame_line_num, 1, recovered=recovered)
+            except BaseException:
+                print(traceback.format_exc())
@@ -0,0 +1,212 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sensor Sharing Service Receive Header Log(columnar ring buffer) """
+
+import time
+import threading
+import numpy
+import packet_codec
+import receiver_stream
+
+
+HEADER_LOG_CAPACITY = 1 << 19  # records (60 s of header log cycle at ~8700 messages/s), oldest overwritten when full
+HEADER_LOG_INITIAL_SIZE = 1 << 12  # records allocated at start, doubled when full up to capacity
+EARTH_RADIUS_M = 6371008.8     # mean earth radius (same as haversine)
+
+# column name -> dtype (one array per column, all grown together)
+HEADER_LOG_COLUMNS = {
+    "db_v2x": packet_codec.DB_V2X_DTYPE,  # DB_V2X header of message
+    "road_condition": numpy.int32,
+    "weather_condition": numpy.int32,
+    "pdr": numpy.float64,
+    "throughput": numpy.float64,
+    "latency": numpy.float64,
+    "distance": numpy.float64,
+    "latitude": numpy.float64,   # receiver position
+    "longitude": numpy.float64,
+    "time_ns": numpy.int64,      # receive time (time.monotonic_ns(), wall_time_ns() for log file)
+}
+HEADER_LOG_RECORD_BYTES = sum(numpy.dtype(dtype).itemsize for dtype in HEADER_LOG_COLUMNS.values())
+# logged header (V2X_RxPDU + DB_V2X bytes) -> DB_V2X, for concatenated headers of extend()
+LOGGED_HEADER_DTYPE = numpy.dtype({"names": ["db_v2x"], "formats": [packet_codec.DB_V2X_DTYPE],
+                                   "offsets": [receiver_stream.RX_HEADER_LEN],
+                                   "itemsize": receiver_stream.RX_PAYLOAD_OFFSET})
+
+
+def wall_time_ns(monotonic_ns):
+    """ monotonic receive times(time.monotonic_ns()) -> wall clock times(time.time_ns()) """
+    return monotonic_ns + (time.time_ns() - time.monotonic_ns())
+
+
+class HeaderLog:
+    """ header log records of received messages : receive side appends, log writer drains in bulk """
+    def __init__(self, capacity=HEADER_LOG_CAPACITY, initial_size=HEADER_LOG_INITIAL_SIZE):
+        """ init (capacity : max records, arrays grow from initial_size as records are buffered) """
+        self.capacity = capacity
+        self.size = min(initial_size, capacity)  # allocated records
+        self.columns = {name: numpy.zeros(self.size, dtype) for name, dtype in HEADER_LOG_COLUMNS.items()}
+        self.db_v2x_bytes = memoryview(self.columns["db_v2x"].view(numpy.uint8))
+        self.lock = threading.Lock()
+        self.start = 0  # index of oldest record
+        self.count = 0
+        # statistics since last stats()
+        self.peak = 0
+        self.overwritten = 0
+
+    def __len__(self):
+        """ buffered records """
+        return self.count
+
+    def clear(self):
+        """ drop buffered records """
+        with self.lock:
+            self.start = 0
+            self.count = 0
+
+    def grow(self, count):
+        """ reallocate columns for count records (at most capacity), buffered records moved to front (locked) """
+        size = self.size
+        while size < count and size < self.capacity:
+            size = min(size * 2, self.capacity)
+        if size == self.size:
+            return
+        first = min(self.count, self.size - self.start)
+        for name, column in self.columns.items():
+            grown = numpy.zeros(size, column.dtype)
+            grown[0:first] = column[self.start:self.start + first]
+            grown[first:self.count] = column[0:self.count - first]
+            self.columns[name] = grown
+        self.db_v2x_bytes = memoryview(self.columns["db_v2x"].view(numpy.uint8))
+        self.size = size
+        self.start = 0
+
+    def append(self, header, road_condition, weather_condition, pdr, throughput, latency, distance, latitude,
+               longitude, time_ns=None):
+        """ record of message (header : V2X_RxPDU + DB_V2X bytes) with current results
+            (time_ns : receive time(time.monotonic_ns()), now if None) """
+        with self.lock:
+            if self.count == self.size:
+                self.grow(self.count + 1)
+            if self.count == self.size:
+                self.start = (self.start + 1) % self.size
+                self.count = self.count - 1
+                self.overwritten = self.overwritten + 1
+            columns = self.columns
+            index = (self.start + self.count) % self.size
+            position = index * packet_codec.DB_V2X_LEN
+            self.db_v2x_bytes[position:position + packet_codec.DB_V2X_LEN] = \
+                header[receiver_stream.RX_HEADER_LEN:receiver_stream.RX_PAYLOAD_OFFSET]
+            columns["road_condition"][index] = road_condition
+            columns["weather_condition"][index] = weather_condition
+            columns["pdr"][index] = pdr
+            columns["throughput"][index] = throughput
+            columns["latency"][index] = latency
+            columns["distance"][index] = distance
+            columns["latitude"][index] = latitude
+            columns["longitude"][index] = longitude
+            columns["time_ns"][index] = time.monotonic_ns() if time_ns is None else time_ns
+            self.count = self.count + 1
+            if self.count > self.peak:
+                self.peak = self.count
+
+    def extend(self, headers, times, road_condition, weather_condition, pdr, throughput, latency, distance,
+               latitude, longitude):
+        """ records of messages (headers : concatenated V2X_RxPDU + DB_V2X bytes, times : receive time_ns of each)
+            with current results, slice assignment per column """
+        values = {
+            "db_v2x": numpy.frombuffer(headers, LOGGED_HEADER_DTYPE)["db_v2x"],
+            "road_condition": road_condition,
+            "weather_condition": weather_condition,
+            "pdr": pdr,
+            "throughput": throughput,
+            "latency": latency,
+            "distance": distance,
+            "latitude": latitude,
+            "longitude": longitude,
+            "time_ns": numpy.asarray(times, numpy.int64),
+        }
+        count = len(values["time_ns"])
+        skip = max(count - self.capacity, 0)  # more records than capacity : only newest kept
+        count = count - skip
+        with self.lock:
+            if self.count + count > self.size:
+                self.grow(self.count + count)
+            dropped = max(self.count + count - self.size, 0)
+            self.start = (self.start + dropped) % self.size
+            self.count = self.count - dropped
+            self.overwritten = self.overwritten + dropped + skip
+            index = (self.start + self.count) % self.size
+            first = min(count, self.size - index)  # records before end of ring, rest from index 0
+            for name, column in self.columns.items():
+                value = values[name]
+                if numpy.ndim(value) == 0:
+                    column[index:index + first] = value
+                    column[0:count - first] = value
+                else:
+                    column[index:index + first] = value[skip:skip + first]
+                    column[0:count - first] = value[skip + first:]
+            self.count = self.count + count
+            if self.count > self.peak:
+                self.peak = self.count
+
+    def drain(self, until_ns):
+        """ remove records received until until_ns(time.monotonic_ns()), return column arrays (oldest first) """
+        with self.lock:
+            end = self.start + self.count
+            # buffered records as at most two contiguous slices of ring
+            slices = [slice(self.start, min(end, self.size))]
+            if end > self.size:
+                slices.append(slice(0, end - self.size))
+            # records are in monotonic receive time order : drained part of each slice, only drained records copied
+            parts = []
+            count = 0
+            for part in slices:
+                drained = int(numpy.searchsorted(self.columns["time_ns"][part], until_ns, "right"))
+                parts.append(slice(part.start, part.start + drained))
+                count = count + drained
+                if drained < part.stop - part.start:
+                    break
+            records = {}
+            for name, column in self.columns.items():
+                records[name] = numpy.concatenate([column[part] for part in parts])
+            self.start = (self.start + count) % self.size
+            self.count = self.count - count
+        return records
+
+    def stats(self):
+        """ buffered / peak records since last call, memory per record """
+        with self.lock:
+            result = {
+                "records": self.count,
+                "peak_records": self.peak,
+                "peak_occupancy": self.peak * 100 / self.capacity,
+                "bytes_per_record": HEADER_LOG_RECORD_BYTES,
+                "buffer_bytes": HEADER_LOG_RECORD_BYTES * self.size,
+                "overwritten": self.overwritten,
+            }
+            self.peak = self.count
+            self.overwritten = 0
+        return result
+
+
+def mileage(latitudes, longitudes):
+    """ cumulative haversine distance(m) along positions (0 at first position) """
+    latitudes = numpy.radians(latitudes)
+    longitudes = numpy.radians(longitudes)
+    d = (numpy.sin(numpy.diff(latitudes) / 2) ** 2
+         + numpy.cos(latitudes[:-1]) * numpy.cos(latitudes[1:]) * numpy.sin(numpy.diff(longitudes) / 2) ** 2)
+    steps = 2 * EARTH_RADIUS_M * numpy.arcsin(numpy.sqrt(d))
+    return numpy.concatenate(([0.0], numpy.cumsum(steps)))
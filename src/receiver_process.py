@@ -0,0 +1,197 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sensor Sharing Service Receive Process(shared memory frames, metric records over pipe) """
+
+import array
+import asyncio
+import threading
+import traceback
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy
+import receiver_frame
+import receiver_engine
+
+
+SHARED_STREAMS = 4          # streams with shared frame buffer (stream id 0 ~ 3), other streams are not shown
+SHARED_HEADER_SIZE = 64     # bytes, generation counters of streams (one cache line)
+PROCESS_STOP_TIMEOUT = 2.0  # seconds, receive process terminated after
+
+
+class SharedFrameBuffers:
+    """ shared memory layout : generation counter per stream + front buffer per stream """
+    def __init__(self, buffer, height, width, streams=SHARED_STREAMS):
+        """ init (buffer : shared memory buffer of size(height, width, streams)) """
+        self.height = height
+        self.width = width
+        self.generations = numpy.ndarray((streams,), numpy.int64, buffer, 0)
+        self.frames = numpy.ndarray((streams, height, width, 3), numpy.uint8, buffer, SHARED_HEADER_SIZE)
+
+    @staticmethod
+    def size(height, width, streams=SHARED_STREAMS):
+        """ shared memory bytes """
+        return SHARED_HEADER_SIZE + streams * height * width * 3
+
+    def frame_store(self, stream_id, lock):
+        """ frame store of stream with front buffer & generation in shared memory """
+        return receiver_frame.FrameStore(self.height, self.width, self.frames[stream_id],
+                                         self.generations[stream_id:stream_id + 1], lock)
+
+
+class StreamView:
+    """ GUI process side of stream (frame store only, receive state is in receive process) """
+    def __init__(self, stream_id, frame_store):
+        """ init """
+        self.stream_id = stream_id
+        self.frame_store = frame_store
+
+
+def run_receiver(shm_name, lock, stop_conn, conn, addr, port, frame_width, frame_height, handshake, streams,
+                 metric_interval):
+    """ receive process : engine writes frames into shared memory, sends metric records each metric tick
+        (stop_conn : stop request of GUI process) """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    buffers = SharedFrameBuffers(shm.buf, frame_height, frame_width, streams)
+    seqs = array.array("I")  # sequence numbers of stream 0 since last record
+    headers = bytearray()    # V2X_RxPDU + DB_V2X of messages since last record
+    header_times = array.array("q")  # receive time(time.monotonic_ns(), same clock in every process) of headers
+
+    def store_factory(stream_id):
+        """ shared frame store (local store for streams without shared buffer) """
+        if stream_id < streams:
+            return buffers.frame_store(stream_id, lock)
+        return receiver_frame.FrameStore(frame_height, frame_width)
+
+    def add_header(header, time_ns):
+        """ header of received message with its receive time """
+        headers.extend(header)
+        header_times.append(time_ns)
+
+    def send_record(snapshot):
+        """ metric record : snapshot, sequence numbers(uint32 bytes), headers(bytes), header times(int64 bytes) """
+        try:
+            conn.send((snapshot, seqs.tobytes(), bytes(headers), header_times.tobytes()))
+        except BaseException:
+            print(traceback.format_exc())
+        del seqs[:]
+        del headers[:]
+        del header_times[:]
+
+    engine = receiver_engine.ReceiverEngine(addr, port, frame_width, frame_height, handshake,
+                                            metric_interval=metric_interval, seq_sink=seqs.append,
+                                            header_sink=add_header, store_factory=store_factory,
+                                            tick_sink=send_record)
+
+    def wait_stop():
+        """ stop request(or closed pipe) of GUI process -> engine stop """
+        try:
+            stop_conn.recv()
+        except (EOFError, OSError):
+            pass
+        engine.stop()
+
+    threading.Thread(target=wait_stop, daemon=True).start()
+    try:
+        if not stop_conn.poll():
+            asyncio.run(engine.run())
+    except BaseException:
+        print(traceback.format_exc())
+    finally:
+        conn.close()  # shared memory mapping released on process exit
+
+
+class ReceiverProcess:
+    """ receive process handle (same start / stop / snapshot / streams as ReceiverEngine, for GUI process) """
+    def __init__(self, addr=receiver_engine.DEVICE_ADDR, port=receiver_engine.DEVICE_PORT,
+                 frame_width=receiver_engine.RECV_FRAME_WIDTH, frame_height=receiver_engine.RECV_FRAME_HEIGHT,
+                 handshake=True, metric_interval=receiver_engine.METRIC_INTERVAL, seq_batch_sink=None,
+                 header_batch_sink=None, streams=SHARED_STREAMS):
+        """ init (seq_batch_sink, header_batch_sink : called on snapshot() once per metric record,
+                  seq_batch_sink(sequence numbers list),
+                  header_batch_sink(concatenated headers, receive time_ns array)) """
+        self.seq_batch_sink = seq_batch_sink
+        self.header_batch_sink = header_batch_sink
+        self.shared_streams = streams
+        self.shm = shared_memory.SharedMemory(create=True,
+                                              size=SharedFrameBuffers.size(frame_height, frame_width, streams))
+        self.buffers = SharedFrameBuffers(self.shm.buf, frame_height, frame_width, streams)
+        self.buffers.generations[:] = 0
+        self.lock = multiprocessing.Lock()
+        # stop request over pipe : sending never blocks on receive process that already exited
+        child_stop_conn, self.stop_conn = multiprocessing.Pipe(duplex=False)
+        self.conn, child_conn = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(
+            target=run_receiver, daemon=True,
+            args=(self.shm.name, self.lock, child_stop_conn, child_conn, addr, port, frame_width, frame_height,
+                  handshake, streams, metric_interval))
+        # stream 0 shown from start, other streams added when receive process reports them
+        self.streams = {0: StreamView(0, self.buffers.frame_store(0, self.lock))}
+        self.latest = {}
+
+    def start(self, duration=0):
+        """ start receive process (duration : seconds, 0 : until stop) """
+        self.process.start()
+        if duration > 0:
+            threading.Timer(duration, self.request_stop).start()
+
+    def snapshot(self):
+        """ receive pending metric records, return latest snapshot (GUI thread) """
+        if self.buffers is None:
+            return self.latest  # stopped
+        try:
+            while self.conn.poll():
+                snapshot, seqs, headers, header_times = self.conn.recv()
+                if self.seq_batch_sink is not None and seqs:
+                    self.seq_batch_sink(numpy.frombuffer(seqs, numpy.uint32).tolist())
+                if self.header_batch_sink is not None and headers:
+                    self.header_batch_sink(headers, numpy.frombuffer(header_times, numpy.int64))
+                self.latest = snapshot
+        except (EOFError, OSError):
+            pass  # receive process stopped
+        for stream_id, stats in self.latest.get("streams", {}).items():
+            if stream_id >= self.shared_streams:
+                continue
+            if stream_id not in self.streams:
+                self.streams[stream_id] = StreamView(stream_id, self.buffers.frame_store(stream_id, self.lock))
+            # published frames counted by receive process, rendered / skipped by viewer of this process
+            view_stats = self.streams[stream_id].frame_store.stats()
+            stats["store"]["rendered_per_sec"] = view_stats["rendered_per_sec"]
+            stats["store"]["skipped_renders"] = view_stats["skipped_renders"]
+        return self.latest
+
+    def request_stop(self):
+        """ ask receive process to stop (no effect if it already exited) """
+        try:
+            self.stop_conn.send(True)
+        except OSError:
+            pass  # receive process exited(pipe broken) or handle closed by stop()
+
+    def stop(self):
+        """ stop receive process & release shared memory """
+        if self.process.is_alive():
+            self.request_stop()
+            self.process.join(PROCESS_STOP_TIMEOUT)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.stop_conn.close()
+        self.conn.close()
+        self.streams.clear()
+        self.buffers = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # frame still referenced by viewer, mapping released with it
+        self.shm.unlink()
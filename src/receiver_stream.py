@@ -0,0 +1,256 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sensor Sharing Service Receive Stream Framing(OBU TCP stream -> RX messages) """
+
+import time
+import struct
+from datetime import datetime
+import numpy
+import packet_codec
+from collections import deque
+
+
+RX_MAGIC_NUM = b'\xf3\xf2'
+RX_HEADER_LEN = 38        # V2X_RxPDU
+RX_LENGTH_OFFSET = 36     # payload length(big endian, 2 bytes) in V2X_RxPDU
+RX_MIN_LENGTH = 2         # payload indicator at least
+RX_MAX_PAYLOAD_LEN = 2302  # OBU payload length : 1 ~ 2302
+RX_MAX_MESSAGE_LEN = RX_HEADER_LEN + RX_MAX_PAYLOAD_LEN
+RX_LENGTH_STRUCT = struct.Struct("!H")
+
+# Receive buffers (recv_into)
+RECV_BUFFER_SIZE = 65536  # bytes per pooled buffer
+RECV_POOL_BUFFERS = 4
+RECV_MIN_FREE = 12288     # free bytes for each recv_into (partial message moved to next buffer below this)
+
+# V2X_RxPDU + DB_V2X + video payload header, read at fixed offsets of every message
+#  (line number of raw row packet and band header / FEC header fields overlap, ping message has no DB_V2X)
+RX_PAYLOAD_OFFSET = RX_HEADER_LEN + packet_codec.DB_V2X_LEN
+RX_HEADER_DTYPE = numpy.dtype({
+    "names": ["magic", "length", "ping_indicator", "db_v2x", "indicator", "seq", "line_num", "row_start",
+              "band_stream_id", "fec_stream_id"],
+    "formats": [">u2", ">u2", ">u2", packet_codec.DB_V2X_DTYPE, ">u2", ">u4", ">i2", ">u2", "u1", "u1"],
+    "offsets": [0, RX_LENGTH_OFFSET, RX_HEADER_LEN, RX_HEADER_LEN, RX_PAYLOAD_OFFSET, RX_PAYLOAD_OFFSET + 2,
+                RX_PAYLOAD_OFFSET + 6, RX_PAYLOAD_OFFSET + 7,
+                RX_PAYLOAD_OFFSET + 6 + packet_codec.BAND_HEADER_STRUCT.size - 1,
+                RX_PAYLOAD_OFFSET + 6 + packet_codec.FEC_HEADER_STRUCT.size - 1],
+    "itemsize": RX_PAYLOAD_OFFSET + 6 + packet_codec.BAND_HEADER_STRUCT.size,
+})
+RX_HEADER_INDEX = numpy.arange(RX_HEADER_DTYPE.itemsize)
+PING_INDICATOR_VALUE = int.from_bytes(packet_codec.PING_INDICATOR, "big")
+DATA_INDICATOR_VALUE = int.from_bytes(packet_codec.VIDEO_DATA_INDICATOR, "big")
+BAND_INDICATOR_VALUE = int.from_bytes(packet_codec.VIDEO_BAND_INDICATOR, "big")
+FEC_INDICATOR_VALUE = int.from_bytes(packet_codec.VIDEO_FEC_INDICATOR, "big")
+
+# Ping request : V2X_TxPDU + indicator + receiver send time + feedback
+PING_HEADER = packet_codec.tx_pdu_header(6 + packet_codec.FEEDBACK_STRUCT.size)
+
+
+def ping_request(pdr, latency):
+    """ ping request with feedback for sender rate control : PDR(0.01 %), Latency(0.1 ms) """
+    receiver_send_time = int(datetime.now().strftime("%S%f")).to_bytes(length=4, byteorder="big", signed=False)
+    feedback = packet_codec.FEEDBACK_STRUCT.pack(min(max(int(pdr * 100), 0), 65535),
+                                                 min(max(int(latency * 10), 0), 65535))
+    return PING_HEADER + packet_codec.PING_INDICATOR + receiver_send_time + feedback
+
+def ping_latency(payload, receive_time):
+    """ ping reply payload & receive time(int of "%S%f") -> one-way latency(ms) = RTT / 2 """
+    sender_recv_time = int.from_bytes(payload[6:10], "big", signed=False)
+    sender_send_time = int.from_bytes(payload[10:14], "big", signed=False)
+    receiver_send_time = int.from_bytes(payload[2:6], "big", signed=False)
+    receiver_delay = receive_time - receiver_send_time
+
+    if receiver_delay < 0:
+        receiver_delay += 60000000
+    sender_delay = sender_send_time - sender_recv_time
+    if sender_delay < 0:
+        sender_delay += 60000000
+    RTT = receiver_delay - sender_delay
+    return RTT / 2000
+
+
+class ReceiveBufferPool:
+    """ reusable receive bytearrays (allocated only when pool is empty or message needs larger buffer) """
+    def __init__(self, buffers=RECV_POOL_BUFFERS, size=RECV_BUFFER_SIZE):
+        """ init """
+        self.size = size
+        self.buffers = buffers
+        self.free = deque(bytearray(size) for _ in range(buffers))
+        self.allocations = 0  # buffers allocated after init
+
+    def acquire(self, size=0):
+        """ free buffer of size bytes at least """
+        if self.free and len(self.free[0]) >= size:
+            return self.free.popleft()
+        self.allocations = self.allocations + 1
+        return bytearray(max(size, self.size))
+
+    def release(self, buffer):
+        """ return buffer to pool (dropped when pool is full) """
+        if len(self.free) < self.buffers:
+            self.free.append(buffer)
+
+
+class StreamFramer:
+    """ TCP byte stream -> whole RX messages (partial message kept for next chunk, resync on bad data) """
+    def __init__(self, magic=RX_MAGIC_NUM, max_message_len=RX_MAX_MESSAGE_LEN, pool=None):
+        """ init """
+        self.magic = magic
+        self.max_message_len = max_message_len
+        self.pool = pool if pool is not None else ReceiveBufferPool()
+        # received bytes are written into buffer, never moved inside buffer
+        #  (message views stay valid until buffer goes back to pool)
+        self.buffer = self.pool.acquire()
+        self.start = 0  # first unparsed byte (partial message)
+        self.end = 0    # end of received bytes
+        self.synced = True  # last bytes were whole messages
+        # statistics since last stats()
+        self.messages = 0
+        self.resyncs = 0          # magic not found where message should start
+        self.discarded_bytes = 0  # bytes skipped to find next magic
+        self.stats_time = time.perf_counter()
+
+    def writable(self, size=RECV_MIN_FREE):
+        """ memoryview of free space of size bytes at least (partial message carried to next buffer if needed) """
+        if len(self.buffer) - self.end < size:
+            carry = self.end - self.start
+            buffer = self.pool.acquire(carry + size)
+            buffer[:carry] = self.buffer[self.start:self.end]
+            self.pool.release(self.buffer)
+            self.buffer = buffer
+            self.start = 0
+            self.end = carry
+        return memoryview(self.buffer)[self.end:]
+
+    def commit(self, nbytes):
+        """ nbytes written into writable() -> (buffer view, offsets, lengths) of new complete messages """
+        self.end = self.end + nbytes
+        messages = self.locate()
+        if not messages:
+            return memoryview(self.buffer), numpy.empty(0, numpy.int64), numpy.empty(0, numpy.int64)
+        offsets, lengths = numpy.array(messages, dtype=numpy.int64).T
+        return memoryview(self.buffer), offsets, lengths
+
+    def recv_into(self, sock):
+        """ receive from socket into pooled buffer -> (buffer view, offsets, lengths), None if closed """
+        nbytes = sock.recv_into(self.writable())
+        if nbytes == 0:
+            return None
+        return self.commit(nbytes)
+
+    def peek(self, nbytes):
+        """ nbytes written into writable(), not committed or discarded yet -> bytes """
+        return bytes(self.buffer[self.end:self.end + nbytes])
+
+    def discard(self, nbytes):
+        """ first nbytes written into writable() dropped without parsing -> dropped bytes (OBU handshake response)
+            (bytes written after them stay at writable() position for next commit / discard) """
+        data = bytes(self.buffer[self.end:self.end + nbytes])
+        self.end = self.end + nbytes
+        self.start = self.end
+        return data
+
+    def feed(self, data):
+        """ received chunk -> list of complete messages (V2X_RxPDU + payload) """
+        self.writable(len(data))[:len(data)] = data
+        self.end = self.end + len(data)
+        return [bytes(self.buffer[offset:offset + length]) for offset, length in self.locate()]
+
+    def feed_batch(self, data):
+        """ received chunk -> (buffer view, message offsets, message lengths) """
+        self.writable(len(data))[:len(data)] = data
+        return self.commit(len(data))
+
+    def locate(self):
+        """ [(offset, length) of complete messages] of unparsed bytes, parsed bytes consumed """
+        buffer = self.buffer
+        messages = []
+        position = self.start
+        end = self.end
+        while end - position >= len(self.magic):
+            if not buffer.startswith(self.magic, position):
+                position = self.skip(position)
+                continue
+            if end - position < RX_HEADER_LEN:
+                break
+            length = RX_LENGTH_STRUCT.unpack_from(buffer, position + RX_LENGTH_OFFSET)[0]
+            message_len = RX_HEADER_LEN + length
+            if length < RX_MIN_LENGTH or message_len > self.max_message_len:
+                position = self.skip(position)  # magic bytes inside garbage
+                continue
+            if end - position < message_len:
+                break
+            messages.append((position, message_len))
+            position = position + message_len
+            self.synced = True
+        self.start = position
+        self.messages = self.messages + len(messages)
+        return messages
+
+    def skip(self, position):
+        """ position of next magic after bad bytes at position (resync) """
+        if self.synced:
+            self.resyncs = self.resyncs + 1
+            self.synced = False
+        found = self.buffer.find(self.magic, position + 1, self.end)
+        if found < 0:
+            found = self.end - len(self.magic) + 1  # last byte may be first byte of split magic
+        self.discarded_bytes = self.discarded_bytes + found - position
+        return found
+
+    def stats(self):
+        """ messages/s, resyncs, discarded & buffered bytes, buffer allocations since last call """
+        now = time.perf_counter()
+        result = {
+            "messages_per_sec": self.messages / (now - self.stats_time) if now > self.stats_time else 0.0,
+            "resyncs": self.resyncs,
+            "discarded_bytes": self.discarded_bytes,
+            "buffered_bytes": self.end - self.start,
+            "buffer_allocations": self.pool.allocations,
+        }
+        self.messages = 0
+        self.resyncs = 0
+        self.discarded_bytes = 0
+        self.pool.allocations = 0
+        self.stats_time = now
+        return result
+
+
+def decode_headers(chunk, offsets, lengths):
+    """ headers of all messages in chunk at once -> column arrays (fields not in message are 0) """
+    # length : message lengths(V2X_RxPDU + payload) from framer
+    # header bytes of every message gathered into one (count, itemsize) array
+    #  (bytes past end of short message belong to next message, their fields are masked below)
+    raw = numpy.frombuffer(chunk, numpy.uint8)
+    index = numpy.minimum(offsets[:, None] + RX_HEADER_INDEX, len(raw) - 1)
+    headers = raw[index].view(RX_HEADER_DTYPE)[:, 0]
+
+    ping = headers["ping_indicator"] == PING_INDICATOR_VALUE
+    video = ~ping
+    indicator = numpy.where(ping, PING_INDICATOR_VALUE, headers["indicator"])
+    band = indicator == BAND_INDICATOR_VALUE
+    fec = indicator == FEC_INDICATOR_VALUE
+    return {
+        "ping": ping,
+        "length": lengths,
+        "indicator": indicator,
+        "seq": numpy.where(video, headers["seq"], 0),
+        "row": numpy.where(band, headers["row_start"],
+                           numpy.where(indicator == DATA_INDICATOR_VALUE, headers["line_num"], 0)),
+        "stream_id": numpy.where(band, headers["band_stream_id"], numpy.where(fec, headers["fec_stream_id"], 0)),
+        "latitude": numpy.where(video, headers["db_v2x"]["ulPayloadLength"], 0) / 1000000,
+        "longitude": numpy.where(video, headers["db_v2x"]["ulPayloadCrc32"], 0) / 1000000,
+    }
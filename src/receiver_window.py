@@ -16,7 +16,6 @@
 """ Sensor Sharing Service for Receiver Widnow(Performance Monitoring) """
 
 import os
-import cv2
 import csv
 import json
 import time
@@ -24,12 +23,17 @@ import math
 import numpy
 import serial
 import pickle
-import struct
 import psutil
 import requests
 import haversine
 import datetime as dt
 import packet_header_struct
+import packet_codec
+import receiver_frame
+import receiver_stream
+import receiver_engine
+import receiver_process
+import receiver_log
 from socket import *
 from scapy.all import *
 from PyQt5.QtGui import *
@@ -75,12 +79,20 @@ HEADER_LOG_CYCLE = 60  # Seconds
 # RTT Variable
 RTT_TIMER = 1
 
+# Receive Mode
+#  thread  : QThread workers (receive, decode, ping)
+#  engine  : asyncio engine thread (socket, handshake, receive, ping, decode)
+#  process : asyncio engine in receive process, frames in shared memory, metric records over pipe
+RECV_MODE = "thread"
+
 # Packet Variable
 WS_REQ = b"\xf1\xf1\x00\x01\x00\x00\x00\x00\x00\x00\x14\x97\x00\x00\x00\x00"
 WS_RESP_MAGIC_NUM = b'\xf1\xf2'
 RX_MAGIC_NUM = b'\xf3\xf2'
 VIDEO_DATA_INDICATOR = b'\x03\x01'
 PING_INDICATOR = b'\x03\x02'
+VIDEO_BAND_INDICATOR = b'\x03\x03'
+VIDEO_FEC_INDICATOR = b'\x03\x04'
 
 # Graph Data Variable
 NET_IF = "이더넷 2"
@@ -111,6 +123,9 @@ pdr_result = 0.0
 throughput_result = 0.0
 latency_result = 0.0
 distance_result = 0.0
+frame_completeness_result = 0.0
+frame_rate_result = 0.0
+frame_latency_result = 0.0
 result_queue = deque()
 webView = 0
 wes_tag = True
@@ -186,21 +201,20 @@ class SaveHeaderWorker(QThread):
     """ Add Message Header to log """
     info_signal = pyqtSignal(str)
 
-    def __init__(self, info_box, header_q):
+    def __init__(self, info_box, header_log):
         """ init """
         super().__init__()
 
         self.info_box = info_box
-        self.header_q = header_q
+        self.header_log = header_log
         self.trig = True
 
     def run(self):
         """ update logfile """
         global result_queue
-        i = 0
 
         while self.trig:
-            num_header = len(self.header_q)
+            num_header = len(self.header_log)
             if num_header > 0:
                 try:
                     now = dt.datetime.now()
@@ -218,83 +232,54 @@ class SaveHeaderWorker(QThread):
                                    'PDR', 'Throughput', 'Latency', 'Distance', 'Mileage']
                     wr.writerow(header_list)
 
-                    i = 0
-                    while True:
-                        try:
-                            header_log = self.header_q.popleft()
-
-                            # DB_V2X  (length = 54)
-                            eDeviceType = struct.unpack(">i", header_log[0][38:42])[0]
-                            eTeleCommType = struct.unpack(">i", header_log[0][42:46])[0]
-                            unDeviceId = struct.unpack(">i", header_log[0][46:50])[0]
-                            eServiceId = struct.unpack(">i", header_log[0][58:62])[0]
-                            eActionType = struct.unpack(">i", header_log[0][62:66])[0]
-                            eRegionId = struct.unpack(">i", header_log[0][66:70])[0]
-                            ePayloadType = struct.unpack(">i", header_log[0][70:74])[0]
-                            eCommId = struct.unpack(">i", header_log[0][74:78])[0]
-                            usDbVer = struct.unpack(">H", header_log[0][78:80])[0]
-                            usHwVer = struct.unpack(">H", header_log[0][80:82])[0]
-                            usSwVer = struct.unpack(">H", header_log[0][82:84])[0]
-                            ulPayloadLength = struct.unpack(">i", header_log[0][84:88])[0]
-                            ulPayloadCrc32 = struct.unpack(">i", header_log[0][88:92])[0]
-
-                            # Calculated Results
-                            road_condition_log = header_log[1]
-                            weather_condition_log = header_log[2]
-                            pdr_result_log = header_log[3]
-                            throughput_result_log = header_log[4]
-                            latency_result_log = header_log[5]
-                            distance_result_log = header_log[6]
-                            ulTimeStamp = header_log[9]
-
-                            if i == 0:
-                                mileage_log = 0
-                                before_latitude = header_log[7]
-                                before_longitude = header_log[8]
-                            else:
-                                mileage_log = mileage_log + haversine.haversine((before_latitude, before_longitude),
-                                                                                (header_log[7], header_log[8]), unit='m')
-                                before_latitude = header_log[7]
-                                before_longitude = header_log[8]
-
-                            log = [
-                                i,
-                                eDeviceType,
-                                eTeleCommType,
-                                unDeviceId,
-                                ulTimeStamp,
-                                eServiceId,
-                                eActionType,
-                                eRegionId,
-                                ePayloadType,
-                                eCommId,
-                                usDbVer,
-                                usHwVer,
-                                usSwVer,
-                                ulPayloadLength,
-                                ulPayloadCrc32,
-                                road_condition_log,
-                                weather_condition_log,
-                                pdr_result_log,
-                                throughput_result_log,
-                                latency_result_log,
-                                distance_result_log,
-                                mileage_log
-                            ]
-
-                            if now < header_log[9]:
-                                break
-                            else:
-                                wr.writerow(log)
-                                i = i+1
-                        except BaseException:
-                            break
+                    # records received until now, all columns at once
+                    log_stats = self.header_log.stats()
+                    records = self.header_log.drain(time.monotonic_ns())
+                    db_v2x = records["db_v2x"]
+                    count = len(db_v2x)
+                    mileage_log = 0
+                    if count > 0:
+                        mileage = receiver_log.mileage(records["latitude"], records["longitude"])
+                        mileage_log = float(mileage[-1])
+                        # ulTimeStamp : receive time (monotonic clock -> wall clock)
+                        receive_times = [dt.datetime.fromtimestamp(time_ns / 1000000000)
+                                         for time_ns in receiver_log.wall_time_ns(records["time_ns"]).tolist()]
+                        wr.writerows(zip(
+                            range(count),
+                            db_v2x["eDeviceType"].tolist(),
+                            db_v2x["eTeleCommType"].tolist(),
+                            db_v2x["unDeviceId"].tolist(),
+                            receive_times,
+                            db_v2x["eServiceId"].tolist(),
+                            db_v2x["eActionType"].tolist(),
+                            db_v2x["eRegionId"].tolist(),
+                            db_v2x["ePayloadType"].tolist(),
+                            db_v2x["eCommId"].tolist(),
+                            db_v2x["usDbVer"].tolist(),
+                            db_v2x["usHwVer"].tolist(),
+                            db_v2x["usSwVer"].tolist(),
+                            db_v2x["ulPayloadLength"].tolist(),
+                            db_v2x["ulPayloadCrc32"].tolist(),
+                            records["road_condition"].tolist(),
+                            records["weather_condition"].tolist(),
+                            records["pdr"].tolist(),
+                            records["throughput"].tolist(),
+                            records["latency"].tolist(),
+                            records["distance"].tolist(),
+                            mileage.tolist()))
 
                     f.close()
-                    self.info_signal.emit(dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S') + "\n - Saving Log File\n(" + file_name + ")\n - Mileage : " + str(mileage_log))
+                    self.info_signal.emit(dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S') + "\n - Saving Log File\n(" + file_name + ")\n - Mileage : " + str(mileage_log)
+                                          + "\n - Log buffer peak : {} records ({:.1f} %), {} bytes/record".format(
+                                              log_stats["peak_records"], log_stats["peak_occupancy"],
+                                              log_stats["bytes_per_record"])
+                                          + ("" if log_stats["overwritten"] == 0 else
+                                             ", {} records overwritten".format(log_stats["overwritten"])))
                     time.sleep(HEADER_LOG_CYCLE)
                 except BaseException:
                     print(traceback.format_exc())
+            else:
+                time.sleep(1)
 
     def stop(self):
         """ stop logfile """
@@ -304,22 +289,36 @@ class SaveHeaderWorker(QThread):
 
 
 class ViewWorker(QThread):
-    """ View receive video-data """
-    def __init__(self, frame, label):
+    """ View receive video-data (streams side by side) """
+    def __init__(self, streams, label):
         """ init """
         super().__init__()
-        self.frame = frame
+        self.streams = streams
         self.video_label = label
         self.trig = True
+        self.generations = {}  # stream id -> generation of rendered frame
+        self.rgb_frames = {}   # stream id -> rendered frame(RGB)
 
     def run(self):
-        """ show frame """
+        """ show frame (only when published frame of any stream is newer than rendered one) """
         while self.trig:
             try:
-                show_frame = cv2.cvtColor(self.frame, cv2.COLOR_BGR2RGB)
-                image = QImage(show_frame, show_frame.shape[1], show_frame.shape[0], QImage.Format_RGB888)
-                pixmap = QPixmap.fromImage(image)
-                self.video_label.setPixmap(pixmap)
+                changed = False
+                for stream_id in sorted(self.streams):
+                    stream = self.streams[stream_id]
+                    if stream_id not in self.rgb_frames:
+                        self.rgb_frames[stream_id] = numpy.empty_like(stream.frame_store.front)
+                    generation = stream.frame_store.read(self.generations.get(stream_id, -1),
+                                                         self.rgb_frames[stream_id])
+                    if generation != self.generations.get(stream_id):
+                        self.generations[stream_id] = generation
+                        changed = True
+                if changed:
+                    frames = [self.rgb_frames[stream_id] for stream_id in sorted(self.rgb_frames)]
+                    show_frame = frames[0] if len(frames) == 1 else numpy.hstack(frames)
+                    image = QImage(show_frame, show_frame.shape[1], show_frame.shape[0], QImage.Format_RGB888)
+                    pixmap = QPixmap.fromImage(image)
+                    self.video_label.setPixmap(pixmap)
             except BaseException:
                 print(traceback.format_exc())
             time.sleep(0.02)
@@ -332,9 +331,49 @@ class ViewWorker(QThread):
         self.wait(10)
 
 
+class DecodeWorker(QThread):
+    """ Decode compressed video bands """
+    def __init__(self, streams):
+        """ init """
+        super().__init__()
+        self.streams = streams
+        self.trig = True
+
+    def run(self):
+        """ decode queued bands of every stream into frame, publish timed-out frames """
+        while self.trig:
+            try:
+                decoded = 0
+                for stream in list(self.streams.values()):
+                    decoded = decoded + stream.band_decoder.decode_pending()
+                    stream.frame_assembler.poll()
+                if decoded == 0:
+                    time.sleep(0.002)
+            except BaseException:
+                print(traceback.format_exc())
+
+    def stop(self):
+        """ stop decode """
+        self.trig = False
+        self.quit()
+        self.wait(10)
+
+
+def append_header_log(header_log, header, time_ns=None):
+    """ header log record : V2X_RxPDU + DB_V2X bytes with current results (time_ns : receive time, now if None) """
+    header_log.append(header, road_condition, weather_condition, pdr_result, throughput_result, latency_result,
+                      distance_result, latitude, longitude, time_ns)
+
+
+def extend_header_log(header_log, headers, times):
+    """ header log records : concatenated V2X_RxPDU + DB_V2X bytes with current results, receive time_ns of each """
+    header_log.extend(headers, times, road_condition, weather_condition, pdr_result, throughput_result,
+                      latency_result, distance_result, latitude, longitude)
+
+
 class ReceiveWorker(QThread):
     """ Receive Message Processing """
-    def __init__(self, sock, frame, pkt_num_q, header_q):
+    def __init__(self, sock, streams, pkt_num_q, header_log):
         """ init """
         super().__init__()
         global DEVICE_ADDR
@@ -346,9 +385,12 @@ class ReceiveWorker(QThread):
         global VIDEO_DATA_INDICATOR
         global wes_tag
 
-        self.show_frame = frame
+        # graph window shows PDR of stream 0
+        self.video_receiver = receiver_frame.VideoReceiver(RECV_FRAME_HEIGHT, RECV_FRAME_WIDTH, streams,
+                                                           pkt_num_q.append)
         self.pkt_num_q = pkt_num_q
-        self.header_q = header_q
+        self.header_log = header_log
+        self.framer = receiver_stream.StreamFramer(RX_MAGIC_NUM)
         self.sock = sock
         self.trig = True
         while wes_tag:
@@ -366,84 +408,49 @@ class ReceiveWorker(QThread):
         """ Receive packet and processing """
         global sender_latitude
         global sender_longitude
-        global latency_result
 
-        break_pre_pkt_temp = ""
         while self.trig:
-            # Receive Packet
+            # Receive Packet (into pooled buffer, whole messages only, partial message kept for next recv)
             try:
-                packet = self.sock.recv(1024 * 12)
+                received = self.framer.recv_into(self.sock)
             except BaseException:
                 print(traceback.format_exc())
                 continue
+            if received is None:
+                continue
 
-            packet_ptr = 0
             receive_time = datetime.now().strftime("%S%f")
-            
-            while True:
+            chunk, offsets, lengths = received
+            if len(offsets) == 0:
+                continue
+            # headers of all messages decoded at once
+            headers = receiver_stream.decode_headers(chunk, offsets, lengths)
+            video = ~headers["ping"]
+            if video.any():
+                sender_latitude = float(headers["latitude"][video][-1])
+                sender_longitude = float(headers["longitude"][video][-1])
+            for offset, length, seq in zip(offsets.tolist(), lengths.tolist(), headers["seq"].tolist()):
                 try:
-                    if packet[packet_ptr:packet_ptr + 2] == RX_MAGIC_NUM:
-                        if packet[packet_ptr+38:packet_ptr+40] == PING_INDICATOR:
-                            packet_header = packet[packet_ptr:packet_ptr + 38]
-                            payload_length = int.from_bytes(packet_header[36:38], "big")
-                            payload = packet[packet_ptr + 38:packet_ptr + 38 + payload_length]
-
-
-                            sender_recv_time = int.from_bytes(payload[6:10], "big", signed=False)
-                            sender_send_time = int.from_bytes(payload[10:14], "big", signed=False)
-                            receiver_send_time = int.from_bytes(payload[2:6], "big", signed=False)
-                            receiver_delay = int(receive_time) - receiver_send_time
-
-                            if receiver_delay < 0:
-                                receiver_delay += 60000000
-                            sender_delay = sender_send_time - sender_recv_time
-                            if sender_delay < 0:
-                                sender_delay += 60000000
-                            RTT = receiver_delay - sender_delay
-                            latency_result = RTT / 2000
-                            packet_ptr = packet_ptr + 38 + payload_length
-                        else:
-                            packet_header = packet[packet_ptr:packet_ptr + 38]
-                            db_c2x_header = packet[packet_ptr + 38:packet_ptr + 38 + 54]
-                            payload_length = int.from_bytes(packet_header[36:38], "big") - 54
-                            payload = packet[packet_ptr + 38 + 54:packet_ptr + 38 + 54 + payload_length]
-
-                            if len(packet[packet_ptr:]) < 38 + 54 + payload_length:
-                                break_pre_pkt_temp = packet[packet_ptr:]
-                                break
-
-                            # Get and Save data
-                            self.header_q.append([packet_header + db_c2x_header, road_condition, weather_condition,
-                                                pdr_result, throughput_result, latency_result, distance_result,
-                                                latitude, longitude, dt.datetime.now()])
-
-                            sender_latitude = float(int.from_bytes(db_c2x_header[46:50], "big")) / 1000000
-                            sender_longitude = float(int.from_bytes(db_c2x_header[50:54], "big")) / 1000000
-
-                            if payload[0:2] != VIDEO_DATA_INDICATOR:
-                                print("Receive RTT")
-                            elif payload[0:2] == VIDEO_DATA_INDICATOR:
-                                self.pkt_num_q.append(int.from_bytes(payload[2:6], "big"))
-                                try:
-                                    frame_line_num = struct.unpack(">h", payload[6:8])[0]
-                                    frame_line_data = numpy.frombuffer(payload[8:], dtype=numpy.uint8)
-                                    frame_line_data = numpy.reshape(frame_line_data, (RECV_FRAME_WIDTH, -1))
-                                    self.show_frame[frame_line_num] = frame_line_data
-                                except BaseException:
-                                    print(traceback.format_exc())
-                            else:
-                                print("Wrong Indicator")
-                            packet_ptr = packet_ptr + 38 + 54 + payload_length
-                            if packet_ptr >= len(packet):
-                                break
-                    else:
-                        packet_ptr = packet_ptr+1
-                        if packet_ptr >= len(packet):
-                            break
+                    self.process_message(chunk[offset:offset + length], receive_time, seq)
                 except BaseException:
                     print(traceback.format_exc())
-                    continue
 
+    def process_message(self, message, receive_time, seq):
+        """ one RX message (memoryview of V2X_RxPDU + payload), seq : sequence number of video message """
+        global latency_result
+
+        if message[38:40] == PING_INDICATOR:
+            latency_result = receiver_stream.ping_latency(message[38:], int(receive_time))
+            return
+
+        # payload view : kept data is copied by FEC decoder / band queue, raw rows are written into frame
+        payload = message[38 + 54:]
+
+        # Get and Save data
+        append_header_log(self.header_log, message[0:38 + 54])
+
+        if not self.video_receiver.add(payload, seq):
+            print("Receive RTT")
 
     def stop(self):
         """ stop receive data """
@@ -477,7 +484,7 @@ class PingWorker(QThread):
             reserved2=0,
             reserved3=0,
             crc=0,
-            length=6
+            length=6 + packet_codec.FEEDBACK_STRUCT.size
         )
         self.trig = True
 
@@ -487,7 +494,10 @@ class PingWorker(QThread):
             try:
                 RST_T = datetime.now().strftime("%S%f")  # receiver send time
                 RST = int(RST_T).to_bytes(length=4, byteorder="big", signed=False)
-                RTT_Packet = bytes(self.v2x_tx_pdu_p) + PING_INDICATOR + RST
+                # Feedback for sender rate control : PDR(0.01 %), Latency(0.1 ms)
+                feedback = packet_codec.FEEDBACK_STRUCT.pack(min(max(int(pdr_result * 100), 0), 65535),
+                                                             min(max(int(latency_result * 10), 0), 65535))
+                RTT_Packet = bytes(self.v2x_tx_pdu_p) + PING_INDICATOR + RST + feedback
                 self.sock.send(RTT_Packet)
                 time.sleep(RTT_TIMER)
             except BaseException:
@@ -508,9 +518,10 @@ class ReceiverVideoWindow(QWidget):
         super().__init__()
         self.show_frame = numpy.zeros((RECV_FRAME_HEIGHT, RECV_FRAME_WIDTH, 3), numpy.uint8)
         self.pkt_num_q = deque()
-        self.header_q = deque()
+        self.header_log = receiver_log.HeaderLog()
+        self.engine = None
 
-        while True:
+        while RECV_MODE == "thread":
             try:
                 self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 self.sock.connect((DEVICE_ADDR, DEVICE_PORT))
@@ -533,6 +544,8 @@ class ReceiverVideoWindow(QWidget):
         # Information Box
         self.info_box = QTextEdit()
         self.info_box.setReadOnly(True)
+        # Video statistics
+        self.stats_label = QLabel()
 
         # UI Arrangement
         self.layout = QGridLayout()
@@ -541,6 +554,7 @@ class ReceiverVideoWindow(QWidget):
         self.left_layout.addWidget(self.button_play)
         self.left_layout.addWidget(self.button_pause)
         self.left_layout.addWidget(self.info_box)
+        self.left_layout.addWidget(self.stats_label)
         self.right_layout.addWidget(self.label)
         self.layout.setColumnStretch(0, 2)
         self.layout.setColumnStretch(1, 4)
@@ -565,20 +579,45 @@ class ReceiverVideoWindow(QWidget):
         self.gps_worker_th = GPSWorker()
         self.gps_worker_th.start()
 
+        # Video statistics timer
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.stats_timer.start(1000)  # Cycle : 1 second
+
     def play_receive_video(self):
         """ play video & thread start  """
-        self.show_frame = numpy.zeros((RECV_FRAME_HEIGHT, RECV_FRAME_WIDTH, 3), numpy.uint8)
         self.pkt_num_q.clear()
-        self.header_q.clear()
+        self.header_log.clear()
         self.info_box.append(dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " : Start Receiving")
-        self.rec_th = ReceiveWorker(self.sock, self.show_frame, self.pkt_num_q, self.header_q)
-        self.view_th = ViewWorker(self.show_frame, self.label)
-        self.ping_th = PingWorker(self.sock)
-        self.save_header_th = SaveHeaderWorker(self.info_box, self.header_q)
+        if RECV_MODE == "engine" or RECV_MODE == "process":
+            # connect, handshake, receive, ping & decode on engine event loop thread(or receive process)
+            if RECV_MODE == "process":
+                # metric records of receive process added in bulk
+                self.engine = receiver_process.ReceiverProcess(
+                    DEVICE_ADDR, DEVICE_PORT, RECV_FRAME_WIDTH, RECV_FRAME_HEIGHT,
+                    seq_batch_sink=self.pkt_num_q.extend,
+                    header_batch_sink=lambda headers, times: extend_header_log(self.header_log, headers, times))
+            else:
+                self.engine = receiver_engine.ReceiverEngine(
+                    DEVICE_ADDR, DEVICE_PORT, RECV_FRAME_WIDTH, RECV_FRAME_HEIGHT, seq_sink=self.pkt_num_q.append,
+                    header_sink=lambda header, time_ns: append_header_log(self.header_log, header, time_ns))
+            self.streams = self.engine.streams
+        else:
+            # stream 0 shown from start, other streams added by receive thread on first packet
+            self.streams = {0: receiver_frame.VideoStream(0, RECV_FRAME_HEIGHT, RECV_FRAME_WIDTH)}
+            self.rec_th = ReceiveWorker(self.sock, self.streams, self.pkt_num_q, self.header_log)
+            self.decode_th = DecodeWorker(self.streams)
+            self.ping_th = PingWorker(self.sock)
+        self.view_th = ViewWorker(self.streams, self.label)
+        self.save_header_th = SaveHeaderWorker(self.info_box, self.header_log)
         self.save_header_th.info_signal.connect(self.update_infobox)
-        self.rec_th.start()
+        if self.engine is not None:
+            self.engine.start()
+        else:
+            self.rec_th.start()
+            self.decode_th.start()
+            self.ping_th.start()
         self.view_th.start()
-        self.ping_th.start()
         self.save_header_th.start()
         self.button_play.setDisabled(True)
         self.button_pause.setDisabled(False)
@@ -586,9 +625,14 @@ class ReceiverVideoWindow(QWidget):
     def pause_video(self):
         """ stop video & thread """
         self.info_box.append(dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S') + " : Stop Receiving")
-        self.rec_th.stop()
-        self.ping_th.stop()
         self.view_th.stop()
+        if self.engine is not None:
+            self.engine.stop()
+            self.engine = None
+        else:
+            self.rec_th.stop()
+            self.decode_th.stop()
+            self.ping_th.stop()
         self.save_header_th.stop()
         self.button_play.setDisabled(False)
         self.button_pause.setDisabled(True)
@@ -597,6 +641,56 @@ class ReceiverVideoWindow(QWidget):
         """ update log text  """
         self.info_box.setText(log)
 
+    def update_stats(self):
+        """ update video statistics """
+        global frame_completeness_result
+        global frame_rate_result
+        global frame_latency_result
+        global latency_result
+        global sender_latitude
+        global sender_longitude
+
+        if not hasattr(self, 'streams'):
+            return
+        if RECV_MODE != "thread":
+            # engine snapshot of last metric tick
+            if self.engine is None:
+                return
+            snapshot = self.engine.snapshot()
+            if not snapshot:
+                return
+            if "error" in snapshot:
+                self.stats_label.setText(snapshot["error"])
+                return
+            latency_result = snapshot["latency_ms"]
+            sender_latitude, sender_longitude = snapshot["sender_position"]
+        else:
+            snapshot = receiver_engine.collect_stats(self.streams, self.rec_th.framer)
+        framer_stats = snapshot["framer"]
+        lines = ["Messages : {:.0f}/s  |  Resyncs : {}  |  Discarded : {} bytes  |  Buffered : {} bytes".format(
+            framer_stats["messages_per_sec"], framer_stats["resyncs"], framer_stats["discarded_bytes"],
+            framer_stats["buffered_bytes"])]
+        for stream_id, stats in snapshot["streams"].items():
+            frame_stats = stats["frame"]
+            if stream_id == 0:
+                frame_completeness_result = frame_stats["completeness"]
+                frame_rate_result = frame_stats["frames_per_sec"]
+                frame_latency_result = frame_stats["latency_ms"]
+            store_stats = stats["store"]
+            line = ("[Stream {}] PDR : {:.1f} %  |  Throughput : {:.2f} Mbps  |  Frames : {:.1f} fps\n".format(
+                stream_id, stats["pdr"], stats["throughput_mbps"], frame_stats["frames_per_sec"])
+                + "    Published : {:.1f} fps  |  Rendered : {:.1f} fps  |  Skipped renders : {}/s\n".format(
+                    store_stats["published_per_sec"], store_stats["rendered_per_sec"], store_stats["skipped_renders"])
+                + "    Decode : {:.2f} ms/frame  |  {} bytes/frame  |  Decode errors : {}  |  ".format(
+                    stats["decode_ms"], stats["frame_bytes"], stats["decode_errors"])
+                + "Rows updated : {}/frame".format(stats["rows_per_frame"]))
+            # FEC recovered / unrecoverable packets per second(timer cycle)
+            if stats["fec_active"]:
+                line = line + "  |  FEC recovered : {}/s, unrecoverable : {}/s".format(
+                    stats["fec_recovered"], stats["fec_unrecoverable"])
+            lines.append(line)
+        self.stats_label.setText("\n".join(lines))
+
     def closeEvent(self, event):
         """ cose Receive video window """
         event.accept()
@@ -604,12 +698,13 @@ class ReceiverVideoWindow(QWidget):
 
 class PDRWorker(QThread):
     """ Display PDR Graph """
-    def __init__(self, pkt_num_q, pdr_subplot, pdr_graph_canvas):
+    def __init__(self, pkt_num_q, pdr_subplot, pdr_graph_canvas, frame_label):
         """ init  """
         super().__init__()
         self.pkt_num_q = pkt_num_q
         self.pdr_subplot = pdr_subplot
         self.pdr_graph_canvas = pdr_graph_canvas
+        self.frame_label = frame_label
         self.pdr_data = []
         self.current_time = []
         self.trig = True
@@ -652,6 +747,9 @@ class PDRWorker(QThread):
                 self.pdr_subplot.fill_between(self.current_time, self.pdr_data, alpha=0.5)
 
                 self.pdr_graph_canvas.draw()
+                self.frame_label.setText("Frame completeness : {:.1f}%  |  Frames : {:.1f}/s  |  "
+                                         "Assembly latency : {:.1f}ms".format(
+                                             frame_completeness_result, frame_rate_result, frame_latency_result))
             except BaseException:
                 print(traceback.format_exc())
             time.sleep(1)
@@ -828,6 +926,7 @@ class ReceiverGraphWindow(QWidget):
         self.pdr_graph_figure.text(0.5, 0.5, 'PDR', style)
         self.pdr_graph_canvas = FigureCanvas(self.pdr_graph_figure)
         self.pdr_subplot = self.pdr_graph_figure.add_subplot()
+        self.frame_label = QLabel()
 
         self.throughput_graph_figure = Figure()
         self.throughput_graph_figure.text(0.5, 0.5, 'Throughput', style)
@@ -849,8 +948,9 @@ class ReceiverGraphWindow(QWidget):
         self.layout = QGridLayout()
         self.layout.addWidget(self.pdr_graph_canvas, 0, 0)
         self.layout.addWidget(self.throughput_graph_canvas, 0, 1)
-        self.layout.addWidget(self.latency_graph_canvas, 1, 0)
-        self.layout.addWidget(self.distance_graph_canvas, 1, 1)
+        self.layout.addWidget(self.frame_label, 1, 0)
+        self.layout.addWidget(self.latency_graph_canvas, 2, 0)
+        self.layout.addWidget(self.distance_graph_canvas, 2, 1)
 
         # Final UI Layout Arrangement
         self.setLayout(self.layout)
@@ -875,7 +975,7 @@ class ReceiverGraphWindow(QWidget):
         self.distance_subplot.set_ylim(0, 100)
         self.distance_subplot.set_ylabel("Distance(Meters)")
 
-        self.pdr_worker_th = PDRWorker(self.pkt_num_q, self.pdr_subplot, self.pdr_graph_canvas)
+        self.pdr_worker_th = PDRWorker(self.pkt_num_q, self.pdr_subplot, self.pdr_graph_canvas, self.frame_label)
         self.pdr_worker_th.start()
 
         self.distance_worker_th = DistanceWorker(self.distance_subplot, self.distance_graph_canvas)
@@ -17,6 +17,7 @@
 
 import os
 import sys
+import multiprocessing
 import sender_window
 import receiver_window
 from PyQt5.QtWidgets import *
@@ -121,6 +122,7 @@ class SelectWindow(QWidget):
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # receive process of frozen executable
     app = QApplication(sys.argv)
     sel_window = SelectWindow()
     sel_window.show()
@@ -0,0 +1,304 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sensor Sharing Service Frame Packetizer(zero-copy row buffers) """
+
+import time
+import cv2
+import numpy
+import packet_codec
+
+
+# Raw row packet header : Video Header + Line Number
+ROW_HEADER_LEN = packet_codec.VIDEO_HEADER_LEN + packet_codec.LINE_NUM_STRUCT.size
+
+# Band packet : Video Header + Band Header
+BAND_PACKET_HEADER_LEN = packet_codec.VIDEO_HEADER_LEN + packet_codec.BAND_HEADER_STRUCT.size
+PAYLOAD_BUDGET = 1300  # video payload bytes per packet (indicator ~ data), receiver MAX_PAYLOAD_SIZE
+BAND_ROWS = 16
+FALLBACK_MIN_QUALITY = 10  # single row over budget : quality halved down to this, then sent as raw row fragments
+
+# Delta mode : row is re-sent when mean absolute difference > threshold
+DELTA_THRESHOLD = 2.0
+DELTA_REFRESH_FRAMES = 30  # full frame every N frames (receiver loss recovery)
+
+# Video codec name -> (payload type, imencode extension, quality parameter)
+VIDEO_CODECS = {
+    "Raw": (packet_codec.PAYLOAD_TYPE_RAW, None, None),
+    "JPEG": (packet_codec.PAYLOAD_TYPE_JPEG, ".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "WebP": (packet_codec.PAYLOAD_TYPE_WEBP, ".webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+def band_data_budget(payload_budget):
+    """ band data bytes per packet for video payload budget """
+    return payload_budget - (BAND_PACKET_HEADER_LEN - packet_codec.V2X_TX_PDU_LEN - packet_codec.DB_V2X_LEN)
+
+def row_runs(row_mask, rows):
+    """ [(first row, end row), ...] of consecutive rows in row_mask """
+    if row_mask is None:
+        return [(0, rows)]
+    edges = numpy.flatnonzero(numpy.diff(numpy.concatenate(([0], row_mask.astype(numpy.int8), [0]))))
+    return list(zip(edges[0::2].tolist(), edges[1::2].tolist()))
+
+
+class BandPacketBuilder:
+    """ band list -> [header, band data, ...] (headers in reusable bytearray) """
+    def __init__(self, stream_id=0):
+        """ init """
+        self.encoder = packet_codec.VideoHeaderEncoder(packet_codec.VIDEO_BAND_INDICATOR)
+        self.stream_id = stream_id
+        self.header_buffer = bytearray()
+        self.header_views = []
+        self.layout = None  # headers written in header buffer (only sequence numbers, frame id change)
+        self.frame_id = 0   # frame id of next frame
+
+    def build(self, payload_type, bands, frame_shape, seq, latitude, longitude):
+        """ bands : [(row start, row count, row offset, data[, payload type of band]), ...]
+            -> buffers & next sequence number (payload_type for bands without own payload type) """
+        layout = (payload_type, frame_shape[:2], latitude, longitude,
+                  [(band[0], band[1], band[2], len(band[3]), band[4] if len(band) > 4 else payload_type)
+                   for band in bands])
+        if layout != self.layout:
+            if len(self.header_buffer) < len(bands) * BAND_PACKET_HEADER_LEN:
+                self.header_buffer = bytearray(len(bands) * BAND_PACKET_HEADER_LEN)
+            header_view = memoryview(self.header_buffer)
+            self.header_views = []
+            for i, (row_start, row_count, row_offset, data_len, band_type) in enumerate(layout[4]):
+                offset = i * BAND_PACKET_HEADER_LEN
+                self.encoder.pack_into(self.header_buffer, offset,
+                                       packet_codec.BAND_HEADER_STRUCT.size + data_len, 0, latitude, longitude)
+                packet_codec.BAND_HEADER_STRUCT.pack_into(self.header_buffer, offset + packet_codec.VIDEO_HEADER_LEN,
+                                                          band_type, row_start, row_count,
+                                                          frame_shape[1], frame_shape[0], row_offset, 0, len(bands),
+                                                          self.stream_id)
+                self.header_views.append(header_view[offset:offset + BAND_PACKET_HEADER_LEN])
+            self.layout = layout
+
+        seq_pack_into = packet_codec.SEQ_STRUCT.pack_into
+        frame_id_pack_into = packet_codec.FRAME_ID_STRUCT.pack_into
+        buffers = []
+        for i, band in enumerate(bands):
+            seq_pack_into(self.header_buffer, i * BAND_PACKET_HEADER_LEN + packet_codec.SEQ_OFFSET, seq)
+            frame_id_pack_into(self.header_buffer, i * BAND_PACKET_HEADER_LEN + packet_codec.FRAME_ID_OFFSET,
+                               self.frame_id)
+            buffers.append(self.header_views[i])
+            buffers.append(band[3])
+            seq = (seq + 1) % packet_codec.SEQ_MODULO
+        self.frame_id = (self.frame_id + 1) % packet_codec.FRAME_ID_MODULO
+        return buffers, seq
+
+
+class RowDeltaFilter:
+    """ select rows changed since last transmitted frame """
+    def __init__(self, threshold=DELTA_THRESHOLD, refresh_frames=DELTA_REFRESH_FRAMES):
+        """ init """
+        self.threshold = threshold
+        self.refresh_frames = refresh_frames
+        self.previous = None  # last transmitted pixel of every row
+        self.diff = None
+        self.frame_count = 0
+        self.changed_rows = 0  # last frame
+
+    def select(self, np_frame):
+        """ bool mask of rows to send """
+        if (self.previous is None or self.previous.shape != np_frame.shape
+                or self.frame_count % self.refresh_frames == 0):
+            self.previous = np_frame.copy()
+            self.diff = numpy.empty_like(np_frame)
+            row_mask = numpy.ones(np_frame.shape[0], dtype=bool)
+        else:
+            cv2.absdiff(np_frame, self.previous, dst=self.diff)
+            row_mask = self.diff.reshape(np_frame.shape[0], -1).mean(axis=1) > self.threshold
+            self.previous[row_mask] = np_frame[row_mask]
+        self.frame_count = self.frame_count + 1
+        self.changed_rows = int(numpy.count_nonzero(row_mask))
+        return row_mask
+
+
+class FramePacketizer:
+    """ frame -> packet buffers (headers in preallocated bytearray + row memoryviews) """
+    def __init__(self, encoder=None):
+        """ init """
+        self.encoder = encoder if encoder is not None else packet_codec.VideoHeaderEncoder()
+        self.header_buffer = bytearray()
+        self.header_views = []
+        self.rows = 0
+        self.patched = None  # (data_len, latitude, longitude) written in header buffer
+        self.encode_time = 0.0  # seconds, last frame
+        self.frame_bytes = 0    # row data bytes, last frame
+        self.frame_packets = 0
+
+    def prepare(self, rows):
+        """ allocate header buffer and write constant header bytes + line numbers once """
+        self.header_buffer = bytearray(rows * ROW_HEADER_LEN)
+        for i in range(rows):
+            offset = i * ROW_HEADER_LEN
+            self.header_buffer[offset:offset + packet_codec.VIDEO_HEADER_LEN] = self.encoder.template
+            packet_codec.LINE_NUM_STRUCT.pack_into(self.header_buffer, offset + packet_codec.VIDEO_HEADER_LEN, i)
+        header_view = memoryview(self.header_buffer)
+        self.header_views = [header_view[i * ROW_HEADER_LEN:(i + 1) * ROW_HEADER_LEN] for i in range(rows)]
+        self.rows = rows
+        self.patched = None
+
+    def packetize(self, np_frame, seq, latitude, longitude, row_mask=None):
+        """ [header, row, header, row, ...] views of frame(rows in row_mask) & next sequence number """
+        start_time = time.perf_counter()
+        frame = numpy.ascontiguousarray(np_frame)  # no copy for cv2.resize output
+        rows = frame.shape[0]
+        row_len = frame.nbytes // rows
+        if rows != self.rows:
+            self.prepare(rows)
+        data_len = packet_codec.LINE_NUM_STRUCT.size + row_len
+
+        # length & gps are same for all rows : patch only when changed
+        if self.patched != (data_len, latitude, longitude):
+            for i in range(rows):
+                self.encoder.patch_into(self.header_buffer, i * ROW_HEADER_LEN, data_len, seq, latitude, longitude)
+            self.patched = (data_len, latitude, longitude)
+
+        pixel_view = memoryview(frame).cast("B")
+        seq_pack_into = packet_codec.SEQ_STRUCT.pack_into
+        buffers = []
+        for i in (range(rows) if row_mask is None else numpy.flatnonzero(row_mask)):
+            seq_pack_into(self.header_buffer, i * ROW_HEADER_LEN + packet_codec.SEQ_OFFSET, seq)
+            buffers.append(self.header_views[i])
+            buffers.append(pixel_view[i * row_len:(i + 1) * row_len])
+            seq = (seq + 1) % packet_codec.SEQ_MODULO
+        self.encode_time = time.perf_counter() - start_time
+        self.frame_packets = len(buffers) // 2
+        self.frame_bytes = self.frame_packets * row_len
+        return buffers, seq
+
+
+class BandPacketizer:
+    """ frame -> compressed horizontal band packets (JPEG / WebP per band) """
+    def __init__(self, codec="JPEG", quality=80, band_rows=BAND_ROWS, payload_budget=PAYLOAD_BUDGET, stream_id=0):
+        """ init """
+        self.payload_type, self.extension, self.quality_param = VIDEO_CODECS[codec]
+        self.params = []
+        self.set_quality(quality)
+        self.band_rows = band_rows
+        self.max_band_bytes = band_data_budget(payload_budget)
+        self.builder = BandPacketBuilder(stream_id)
+        self.encode_time = 0.0  # seconds, last frame
+        self.frame_bytes = 0    # band data bytes, last frame
+        self.frame_packets = 0
+        # single rows over budget at frame quality, last frame
+        self.frame_requality_rows = 0  # sent at lower quality
+        self.frame_raw_rows = 0        # sent as raw row fragments
+
+    def set_quality(self, quality):
+        """ update JPEG / WebP quality """
+        if self.quality_param is not None:
+            self.params = [self.quality_param, int(quality)]
+
+    def encode_band(self, band, params=None):
+        """ band rows -> band data (params : imencode parameters, frame quality if None) """
+        if self.extension is None:
+            return memoryview(numpy.ascontiguousarray(band)).cast("B")
+        ret, data = cv2.imencode(self.extension, band, self.params if params is None else params)
+        if not ret:
+            raise ValueError("imencode failed : " + self.extension)
+        return memoryview(data).cast("B")
+
+    def encode_rows(self, np_frame, row_start, row_count, bands):
+        """ encode rows, split band in half while it exceeds max_band_bytes """
+        data = self.encode_band(np_frame[row_start:row_start + row_count])
+        if len(data) <= self.max_band_bytes:
+            bands.append((row_start, row_count, 0, data))
+        elif row_count > 1:
+            half = row_count // 2
+            self.encode_rows(np_frame, row_start, half, bands)
+            self.encode_rows(np_frame, row_start + half, row_count - half, bands)
+        else:
+            self.encode_row_fallback(np_frame, row_start, bands)
+
+    def encode_row_fallback(self, np_frame, row, bands):
+        """ single row over max_band_bytes : lower quality, raw row fragments if still over """
+        quality = self.params[1] if self.params else FALLBACK_MIN_QUALITY
+        while quality > FALLBACK_MIN_QUALITY:
+            quality = max(quality // 2, FALLBACK_MIN_QUALITY)
+            data = self.encode_band(np_frame[row:row + 1], [self.quality_param, quality])
+            if len(data) <= self.max_band_bytes:
+                bands.append((row, 1, 0, data))
+                self.frame_requality_rows = self.frame_requality_rows + 1
+                return
+        # receiver writes raw bands straight into frame (row offset : byte offset in row)
+        data = memoryview(numpy.ascontiguousarray(np_frame[row])).cast("B")
+        for offset in range(0, len(data), self.max_band_bytes):
+            bands.append((row, 1, offset, data[offset:offset + self.max_band_bytes], packet_codec.PAYLOAD_TYPE_RAW))
+        self.frame_raw_rows = self.frame_raw_rows + 1
+
+    def packetize(self, np_frame, seq, latitude, longitude, row_mask=None):
+        """ [header, band data, ...] of frame(bands with rows in row_mask) & next sequence number """
+        start_time = time.perf_counter()
+        bands = []
+        self.frame_requality_rows = 0
+        self.frame_raw_rows = 0
+        for row_start in range(0, np_frame.shape[0], self.band_rows):
+            row_count = min(self.band_rows, np_frame.shape[0] - row_start)
+            if row_mask is not None and not row_mask[row_start:row_start + row_count].any():
+                continue
+            self.encode_rows(np_frame, row_start, row_count, bands)
+        self.encode_time = time.perf_counter() - start_time
+
+        buffers, seq = self.builder.build(self.payload_type, bands, np_frame.shape, seq, latitude, longitude)
+        self.frame_bytes = sum(len(band[3]) for band in bands)
+        self.frame_packets = len(bands)
+        return buffers, seq
+
+
+class PackedRowPacketizer:
+    """ frame -> raw packets packed with whole rows or row fragments up to payload budget """
+    def __init__(self, payload_budget=PAYLOAD_BUDGET, whole_rows=False, stream_id=0):
+        """ init """
+        self.data_budget = band_data_budget(payload_budget)
+        self.whole_rows = whole_rows
+        self.builder = BandPacketBuilder(stream_id)
+        self.encode_time = 0.0  # seconds, last frame
+        self.frame_bytes = 0    # row data bytes, last frame
+        self.frame_packets = 0
+
+    def set_quality(self, quality):
+        """ raw data : no quality """
+
+    def packetize(self, np_frame, seq, latitude, longitude, row_mask=None):
+        """ [header, packed rows, ...] views of frame(rows in row_mask) & next sequence number """
+        start_time = time.perf_counter()
+        frame = numpy.ascontiguousarray(np_frame)
+        rows = frame.shape[0]
+        row_len = frame.nbytes // rows
+        chunk = self.data_budget
+        if self.whole_rows or chunk < 1:
+            chunk = max(1, self.data_budget // row_len) * row_len
+        pixel_view = memoryview(frame).cast("B")
+
+        bands = []
+        for run_start, run_end in row_runs(row_mask, rows):
+            start = run_start * row_len
+            end = run_end * row_len
+            while start < end:
+                stop = min(start + chunk, end)
+                row_start = start // row_len
+                bands.append((row_start, (stop - 1) // row_len - row_start + 1, start % row_len,
+                              pixel_view[start:stop]))
+                start = stop
+
+        buffers, seq = self.builder.build(packet_codec.PAYLOAD_TYPE_RAW, bands, frame.shape, seq, latitude, longitude)
+        self.encode_time = time.perf_counter() - start_time
+        self.frame_bytes = sum(len(band[3]) for band in bands)
+        self.frame_packets = len(bands)
+        return buffers, seq
@@ -0,0 +1,170 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sensor Sharing Service Headless Sender(command line, no GUI) """
+
+import sys
+import time
+import socket
+import argparse
+import threading
+import rate_controller
+import sender_frame
+import sender_pipeline
+import sender_source
+import sender_transmit
+
+
+# 5G NR Device Connection Variable
+DEVICE_ADDR = '192.168.1.11'
+DEVICE_PORT = 47347
+
+# Packet Variable
+WS_REQ = b"\xf1\xf1\x00\x01\x00\x00\x00\x00\x00\x00\x14\x97\x00\x00\x00\x00"
+WS_RESP_MAGIC_NUM = b'\xf1\xf2'
+
+STATS_INTERVAL = 1.0  # seconds
+
+
+def parse_args(argv=None):
+    """ command line options """
+    parser = argparse.ArgumentParser(description="Sensor sharing service sender without GUI")
+    parser.add_argument("--source", choices=sender_source.SOURCE_TYPES, action="append",
+                        help="frame source, repeat for multiple streams (default : synthetic)")
+    parser.add_argument("--path", action="append", default=[], help="video file or image path of each --source")
+    parser.add_argument("--change-ratio", type=float, default=1.0,
+                        help="synthetic / noise source : fraction of rows changed per frame")
+    parser.add_argument("--addr", default=DEVICE_ADDR)
+    parser.add_argument("--port", type=int, default=DEVICE_PORT)
+    parser.add_argument("--no-handshake", action="store_true", help="skip OBU WS request (plain TCP sink)")
+    parser.add_argument("--width", type=int, default=300)
+    parser.add_argument("--height", type=int, default=300)
+    parser.add_argument("--frame-msec", type=float, default=0,
+                        help="0 : native FPS of video file (file / replay), 120 otherwise")
+    parser.add_argument("--codec", choices=list(sender_frame.VIDEO_CODECS), default="Raw")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--no-pack-rows", action="store_true")
+    parser.add_argument("--payload-budget", type=int, default=sender_frame.PAYLOAD_BUDGET)
+    parser.add_argument("--delta", action="store_true")
+    parser.add_argument("--adaptive", action="store_true")
+    parser.add_argument("--fec-group", type=int, default=0)
+    parser.add_argument("--pacing-rate", type=float, default=0, help="Mbps, 0 : spread frame over frame interval")
+    parser.add_argument("--pacing-burst", type=int, default=6000)
+    parser.add_argument("--no-pacing", action="store_true")
+    parser.add_argument("--latitude", type=float, default=12.0)
+    parser.add_argument("--longitude", type=float, default=34.0)
+    parser.add_argument("--duration", type=float, default=0, help="seconds, 0 : until Ctrl+C")
+    parser.add_argument("--interval", type=float, default=STATS_INTERVAL, help="statistics print interval")
+    args = parser.parse_args(argv)
+    # --path is matched to --source by order
+    for index, source_type in enumerate(args.source or []):
+        if source_type in sender_source.PATH_SOURCE_TYPES and index >= len(args.path):
+            parser.error("--source {} (#{}) needs a matching --path".format(source_type, index + 1))
+    return args
+
+
+def connect(addr, port, handshake=True):
+    """ connect OBU (WS request / response) """
+    sock = socket.create_connection((addr, port))
+    if handshake:
+        sock.send(WS_REQ)
+        ws_resp = sock.recv(1024)
+        if ws_resp[0:2] != WS_RESP_MAGIC_NUM:
+            print("Fail")
+    return sock
+
+
+def main(argv=None):
+    """ run sender until duration or Ctrl+C """
+    args = parse_args(argv)
+    source_types = args.source or ["synthetic"]
+    paths = args.path + [None] * (len(source_types) - len(args.path))
+    sources = [sender_source.open_source(source_type, path, args.width, args.height, args.change_ratio)
+               for source_type, path in zip(source_types, paths)]
+    sock = connect(args.addr, args.port, not args.no_handshake)
+
+    pacer = None
+    if not args.no_pacing:
+        pacer = sender_transmit.TokenBucketPacer(args.pacing_rate * 1000000, args.pacing_burst)
+    tx_scheduler = sender_transmit.TransmitScheduler(sock, pacer=pacer)
+    rate_ctrl = None
+    if args.adaptive:
+        rate_ctrl = rate_controller.RateController(log_path=rate_controller.default_log_path())
+    # one pipeline per source (stream id = source order), all sharing transmit scheduler
+    pipelines = []
+    for stream_id, (source_type, source) in enumerate(zip(source_types, sources)):
+        source_msec = source.frame_msec() if source_type in ("file", "replay") else None
+        pipelines.append(sender_pipeline.SenderPipeline(
+            source, tx_scheduler,
+            lambda stream_id=stream_id: sender_pipeline.create_packetizer(
+                args.codec, args.quality, not args.no_pack_rows, args.adaptive, args.payload_budget, stream_id),
+            args.width, args.height, args.frame_msec or source_msec or 120, args.delta, args.fec_group, rate_ctrl,
+            lambda: (args.latitude, args.longitude), source_msec=source_msec, stream_id=stream_id))
+    ping_responder = sender_transmit.PingResponder(sock, tx_scheduler, rate_ctrl)
+
+    tx_scheduler.start()
+    capture_ths = []
+    for pipeline in pipelines:
+        pipeline.start()
+        capture_ths.append(threading.Thread(target=pipeline.run, daemon=True))
+        capture_ths[-1].start()
+    ping_th = threading.Thread(target=ping_responder.run, daemon=True)
+    ping_th.start()
+
+    start_time = time.monotonic()
+    last_time = start_time
+    last_bytes = 0
+    try:
+        while args.duration <= 0 or time.monotonic() - start_time < args.duration:
+            time.sleep(args.interval)
+            now = time.monotonic()
+            sent_bytes = tx_scheduler.batch_sender.bytes_sent
+            queue_stats = tx_scheduler.stats()
+            elapsed = now - last_time
+            print("[{:7.1f}s] {:.2f} Mbps  {:.0f} pps  ping {}  queue video {} control {}".format(
+                now - start_time, (sent_bytes - last_bytes) * 8 / elapsed / 1000000,
+                (queue_stats["video"]["packets"] + queue_stats["control"]["packets"]) / elapsed,
+                ping_responder.replies, queue_stats["video"]["depth"], queue_stats["control"]["depth"]))
+            for pipeline in pipelines:
+                stage_stats = pipeline.stats()
+                print("    stream {} : {:.1f} fps  deadline misses {}  drops {}".format(
+                    pipeline.stream_id, stage_stats["schedule"]["fps"], stage_stats["schedule"]["misses"],
+                    stage_stats["capture"]["drops"]))
+            sys.stdout.flush()
+            last_time = now
+            last_bytes = sent_bytes
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ping_responder.stop()
+        tx_scheduler.stop()
+        for pipeline in pipelines:
+            pipeline.stop()
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+        for capture_th in capture_ths:
+            capture_th.join(1)
+        for source in sources:
+            source.release()
+        if rate_ctrl is not None:
+            rate_ctrl.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
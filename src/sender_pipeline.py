@@ -0,0 +1,397 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sensor Sharing Service Sender Pipeline(capture / encode / send stages) """
+
+import time
+import threading
+import traceback
+import cv2
+import numpy
+import packet_codec
+import packet_fec
+import sender_frame
+import sender_transmit
+from collections import deque
+
+
+FRAME_RING_SLOTS = 4  # capture / ready / encoded / sending frames
+PACKETIZER_POOL = 2   # frame encoded while previous frame is sending
+STAGE_NAMES = ("capture", "encode", "send")
+DEADLINE_TOLERANCE_NS = 2000000  # frame later than deadline by more than this is deadline miss
+PREVIEW_FPS = 10  # preview frames handed to viewer per second at most (0 : every captured frame)
+
+
+def create_packetizer(codec, quality, pack_rows, adaptive, payload_budget=sender_frame.PAYLOAD_BUDGET, stream_id=0):
+    """ packetizer for codec (Raw / JPEG / WebP) """
+    if codec == "Raw" and not pack_rows and not adaptive and stream_id == 0:
+        return sender_frame.FramePacketizer()
+    if codec == "Raw":
+        # band packets carry frame size & stream id, so receiver can follow resolution changes / demultiplex
+        return sender_frame.PackedRowPacketizer(payload_budget, stream_id=stream_id)
+    return sender_frame.BandPacketizer(codec, quality, payload_budget=payload_budget, stream_id=stream_id)
+
+
+class FrameRing:
+    """ preallocated frame slots, newest ready frame is taken & older ready frames dropped """
+    def __init__(self, slots=FRAME_RING_SLOTS):
+        """ init """
+        self.buffers = [None] * slots
+        self.free = deque(range(slots))
+        self.ready = deque()  # slot indexes, oldest first
+        self.condition = threading.Condition()
+        self.closed = False
+        self.drops = 0  # ready frames overwritten or skipped
+
+    def acquire(self, shape):
+        """ free slot index & buffer for frame of shape (reuse oldest ready slot when full, None if all busy) """
+        with self.condition:
+            if self.free:
+                index = self.free.popleft()
+            elif self.ready:
+                index = self.ready.popleft()
+                self.drops = self.drops + 1
+            else:
+                return None, None
+        buffer = self.buffers[index]
+        if buffer is None or buffer.shape != shape:
+            buffer = numpy.empty(shape, dtype=numpy.uint8)
+            self.buffers[index] = buffer
+        return index, buffer
+
+    def publish(self, index):
+        """ frame written in slot """
+        with self.condition:
+            self.ready.append(index)
+            self.condition.notify_all()
+
+    def take(self, timeout=None):
+        """ newest ready slot index (None on timeout / close) """
+        with self.condition:
+            self.condition.wait_for(lambda: self.ready or self.closed, timeout)
+            if not self.ready:
+                return None
+            index = self.ready.pop()
+            while self.ready:
+                self.free.append(self.ready.popleft())
+                self.drops = self.drops + 1
+            return index
+
+    def release(self, index):
+        """ slot no longer used by encode / send stage """
+        with self.condition:
+            self.free.append(index)
+            self.condition.notify_all()
+
+    def close(self):
+        """ wake up waiting stage """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class StageTimer:
+    """ frames & processing time of pipeline stage """
+    def __init__(self):
+        """ init """
+        self.frames = 0
+        self.time_sum = 0.0
+        self.time_max = 0.0
+        self.drops = 0  # cumulative
+
+    def add(self, elapsed):
+        """ frame processed in elapsed seconds """
+        self.frames = self.frames + 1
+        self.time_sum = self.time_sum + elapsed
+        self.time_max = max(self.time_max, elapsed)
+
+    def stats(self):
+        """ frames, average & max time(ms) since last call """
+        result = {
+            "frames": self.frames,
+            "time_ms": self.time_sum * 1000 / self.frames if self.frames else 0.0,
+            "max_time_ms": self.time_max * 1000,
+            "drops": self.drops,
+        }
+        self.frames = 0
+        self.time_sum = 0.0
+        self.time_max = 0.0
+        return result
+
+
+class FrameScheduler:
+    """ absolute frame deadlines on monotonic clock, deadlines skipped when behind (no drift) """
+    def __init__(self, tolerance_ns=DEADLINE_TOLERANCE_NS):
+        """ init """
+        self.tolerance_ns = tolerance_ns
+        self.deadline = None  # ns, next frame
+        # statistics since last stats()
+        self.frames = 0
+        self.misses = 0
+        self.skipped = 0
+        self.stats_time = time.monotonic_ns()
+
+    def wait(self, interval_ns):
+        """ sleep until next deadline, return number of skipped frame deadlines """
+        now = time.monotonic_ns()
+        if self.deadline is None:
+            self.deadline = now
+        elif now < self.deadline:
+            time.sleep((self.deadline - now) / 1000000000)
+            now = time.monotonic_ns()
+        skip = 0
+        late = now - self.deadline
+        if late > self.tolerance_ns:
+            self.misses = self.misses + 1
+            skip = late // interval_ns
+            self.skipped = self.skipped + skip
+            self.deadline = self.deadline + skip * interval_ns
+        self.deadline = self.deadline + interval_ns
+        self.frames = self.frames + 1
+        return skip
+
+    def reset(self):
+        """ start new timeline (next wait returns immediately) """
+        self.deadline = None
+
+    def stats(self):
+        """ achieved fps, deadline misses & skipped frames since last call """
+        now = time.monotonic_ns()
+        result = {
+            "fps": self.frames * 1000000000 / (now - self.stats_time) if now > self.stats_time else 0.0,
+            "misses": self.misses,
+            "skipped": self.skipped,
+        }
+        self.frames = 0
+        self.misses = 0
+        self.skipped = 0
+        self.stats_time = now
+        return result
+
+
+class PreviewBuffer:
+    """ preview frame shared with viewer : rate limited, dropped while previous preview is not shown """
+    def __init__(self, fps=PREVIEW_FPS):
+        """ init """
+        self.interval_ns = 1000000000 // fps if fps > 0 else 0
+        self.next_ns = 0
+        self.frame = None      # written by capture thread only while not pending
+        self.pending = False   # frame handed to viewer, not shown yet
+        # statistics since last stats()
+        self.shown = 0
+        self.dropped = 0  # preview due while viewer busy
+        self.stats_time = time.monotonic_ns()
+
+    def offer(self, np_frame):
+        """ copy frame into preview buffer if preview is due & viewer is free """
+        now = time.monotonic_ns()
+        if now < self.next_ns:
+            return False
+        if self.pending:
+            self.dropped = self.dropped + 1
+            return False
+        if self.frame is None or self.frame.shape != np_frame.shape:
+            self.frame = numpy.empty_like(np_frame)
+        numpy.copyto(self.frame, np_frame)
+        self.next_ns = now + self.interval_ns
+        self.pending = True
+        return True
+
+    def done(self):
+        """ viewer finished with preview frame """
+        self.pending = False
+        self.shown = self.shown + 1
+
+    def stats(self):
+        """ shown preview fps & dropped previews since last call """
+        now = time.monotonic_ns()
+        result = {
+            "fps": self.shown * 1000000000 / (now - self.stats_time) if now > self.stats_time else 0.0,
+            "dropped": self.dropped,
+        }
+        self.shown = 0
+        self.dropped = 0
+        self.stats_time = now
+        return result
+
+
+class SenderPipeline:
+    """ capture -> frame ring -> encode -> send, one thread per stage (capture runs in caller thread) """
+    def __init__(self, cap, tx_scheduler, packetizer_factory, frame_width=300, frame_height=300, frame_msec=120,
+                 delta=False, fec_group=0, rate_ctrl=None, position=None, preview=None, ring_slots=FRAME_RING_SLOTS,
+                 source_msec=None, stream_id=0, preview_fps=PREVIEW_FPS):
+        """ init """
+        self.video_cap = cap
+        self.tx_scheduler = tx_scheduler
+        self.packetizers = deque(packetizer_factory() for _ in range(PACKETIZER_POOL))  # free packetizers
+        self.packetizer = self.packetizers[0]  # last used (statistics)
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.frame_msec = frame_msec
+        self.delta_filter = sender_frame.RowDeltaFilter() if delta else None
+        self.fec_encoder = packet_fec.XorFecEncoder(fec_group, stream_id) if fec_group > 0 else None
+        self.stream_id = stream_id
+        self.rate_ctrl = rate_ctrl
+        self.position = position if position is not None else (lambda: (0.0, 0.0))
+        self.preview = preview  # callback(preview frame) on capture thread, viewer calls preview_buffer.done()
+        self.preview_buffer = PreviewBuffer(preview_fps)
+        self.source_msec = source_msec  # saved video : native frame interval (video time follows wall clock)
+        self.frame_scheduler = FrameScheduler()
+        self.ring = FrameRing(ring_slots)
+        self.capture_frame = None  # decoded capture frame, reused by read() while resolution is same
+        self.encoded = deque()  # (slot index, packetizer, buffers, frame msec)
+        self.condition = threading.Condition()  # packetizers & encoded frames
+        self.timers = {name: StageTimer() for name in STAGE_NAMES}
+        self.seq = 0
+        self.frame_id = 0
+        self.trig = True
+        self.threads = [threading.Thread(target=self.encode_loop, daemon=True),
+                        threading.Thread(target=self.send_loop, daemon=True)]
+
+    def start(self):
+        """ start encode & send threads """
+        for thread in self.threads:
+            thread.start()
+
+    def run(self):
+        """ capture stage (until stop) """
+        start_ns = time.monotonic_ns()
+        source_frames = 0  # saved video frames read
+        while self.trig:
+            frame_msec = self.frame_msec
+            frame_width = self.frame_width
+            frame_height = self.frame_height
+            if self.rate_ctrl is not None:
+                frame_msec = self.rate_ctrl.frame_msec
+                frame_width = self.rate_ctrl.frame_width
+                frame_height = self.rate_ctrl.frame_height
+            self.frame_scheduler.wait(int(frame_msec * 1000000))
+            if self.source_msec:
+                # skip saved video frames behind wall clock
+                position = (time.monotonic_ns() - start_ns) / 1000000 / self.source_msec
+                while source_frames + 1 < position and self.trig:
+                    if not self.video_cap.grab():
+                        break
+                    source_frames = source_frames + 1
+                source_frames = source_frames + 1
+            ret, frame = self.video_cap.read(self.capture_frame)
+            if not ret:
+                continue
+            self.capture_frame = frame
+
+            start_time = time.perf_counter()
+            index, buffer = self.ring.acquire((frame_height, frame_width, 3))
+            if index is None:
+                self.timers["capture"].drops = self.timers["capture"].drops + 1
+                continue
+            try:
+                # ring buffers are allocated once per resolution, resize writes into them
+                cv2.resize(frame, (frame_width, frame_height), dst=buffer, interpolation=cv2.INTER_AREA)
+                if self.preview is not None and self.preview_buffer.offer(buffer):
+                    self.preview(self.preview_buffer.frame)
+            except BaseException:
+                print(traceback.format_exc())
+            self.ring.publish(index)
+            self.timers["capture"].add(time.perf_counter() - start_time)
+
+    def encode_loop(self):
+        """ encode stage : newest captured frame -> packets """
+        while self.trig:
+            # packetizer first, so frame is taken as late as possible
+            with self.condition:
+                self.condition.wait_for(lambda: self.packetizers or not self.trig)
+                if not self.trig:
+                    break
+                packetizer = self.packetizers.popleft()
+            index = self.ring.take(0.1)
+            if index is None:
+                with self.condition:
+                    self.packetizers.appendleft(packetizer)
+                continue
+
+            start_time = time.perf_counter()
+            try:
+                np_frame = self.ring.buffers[index]
+                frame_msec = self.frame_msec
+                if self.rate_ctrl is not None:
+                    frame_msec = self.rate_ctrl.frame_msec
+                    packetizer.set_quality(self.rate_ctrl.quality)
+                builder = getattr(packetizer, "builder", None)
+                if builder is not None:
+                    builder.frame_id = self.frame_id  # frame ids continue across pooled packetizers
+                    self.frame_id = (self.frame_id + 1) % packet_codec.FRAME_ID_MODULO
+                row_mask = None
+                if self.delta_filter is not None:
+                    row_mask = self.delta_filter.select(np_frame)
+                latitude, longitude = self.position()
+                buffers, self.seq = packetizer.packetize(np_frame, self.seq, latitude, longitude, row_mask)
+                if self.fec_encoder is not None and buffers:
+                    # parity packets at end of frame
+                    parity_buffers, self.seq = self.fec_encoder.protect(buffers, self.seq, latitude, longitude)
+                    buffers = buffers + parity_buffers
+                self.packetizer = packetizer
+            except BaseException:
+                print(traceback.format_exc())
+                self.ring.release(index)
+                with self.condition:
+                    self.packetizers.append(packetizer)
+                continue
+            self.timers["encode"].add(time.perf_counter() - start_time)
+            with self.condition:
+                self.encoded.append((index, packetizer, buffers, frame_msec))
+                self.condition.notify_all()
+
+    def send_loop(self):
+        """ send stage : packets -> transmit scheduler, slot & packetizer released after sent """
+        while self.trig:
+            with self.condition:
+                self.condition.wait_for(lambda: self.encoded or not self.trig)
+                if not self.trig:
+                    break
+                index, packetizer, buffers, frame_msec = self.encoded.popleft()
+
+            start_time = time.perf_counter()
+            try:
+                if self.tx_scheduler.pacer is not None:
+                    self.tx_scheduler.pacer.spread(sum(len(buf) for buf in buffers), frame_msec / 1000,
+                                                   self.stream_id)
+                ticket = self.tx_scheduler.submit(sender_transmit.PRIORITY_VIDEO,
+                                                  [buffers[i:i + 2] for i in range(0, len(buffers), 2)])
+                # packetizer header buffers & frame slot are referenced until sent
+                self.tx_scheduler.wait_sent(sender_transmit.PRIORITY_VIDEO, ticket=ticket)
+            except BaseException:
+                print(traceback.format_exc())
+            self.timers["send"].add(time.perf_counter() - start_time)
+            self.ring.release(index)
+            with self.condition:
+                self.packetizers.append(packetizer)
+                self.condition.notify_all()
+
+    def stop(self):
+        """ stop all stages """
+        self.trig = False
+        self.ring.close()
+        with self.condition:
+            self.condition.notify_all()
+        for thread in self.threads:
+            if thread.is_alive():
+                thread.join(1)
+
+    def stats(self):
+        """ per-stage frames, time & drops since last call """
+        result = {name: timer.stats() for name, timer in self.timers.items()}
+        result["capture"]["drops"] = result["capture"]["drops"] + self.ring.drops
+        result["schedule"] = self.frame_scheduler.stats()
+        return result
@@ -0,0 +1,216 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sensor Sharing Service Sender Frame Source(video file, synthetic pattern, still image) """
+
+import abc
+import cv2
+import numpy
+
+
+SOURCE_TYPES = ("file", "replay", "synthetic", "noise", "image")
+PATH_SOURCE_TYPES = ("file", "replay", "image")  # source types reading --path
+REPLAY_MAX_FRAMES = 600  # decoded frames kept in memory by replay source
+NOISE_SEED = 5271        # same noise sequence every run
+
+
+class VideoFileSource:
+    """ video file, rewind at end when loop """
+    def __init__(self, path, loop=True):
+        """ init """
+        self.video_cap = cv2.VideoCapture(path)
+        if not self.video_cap.isOpened():
+            raise ValueError("cannot open video file : %s" % path)
+        self.loop = loop
+
+    def read(self, image=None):
+        """ (ret, frame) like cv2.VideoCapture (decoded into image if same size) """
+        ret, frame = self.video_cap.read(image)
+        if not ret and self.loop:
+            self.video_cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.video_cap.read(image)
+        return ret, frame
+
+    def grab(self):
+        """ skip frame like cv2.VideoCapture """
+        if self.video_cap.grab():
+            return True
+        if self.loop:
+            self.video_cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            return self.video_cap.grab()
+        return False
+
+    def frame_msec(self):
+        """ native frame interval (None if unknown) """
+        fps = self.video_cap.get(cv2.CAP_PROP_FPS)
+        return 1000 / fps if fps > 0 else None
+
+    def release(self):
+        """ close file """
+        self.video_cap.release()
+
+
+class ReplaySource:
+    """ video file decoded into memory once, replayed in loop (no decoder cost while sending) """
+    def __init__(self, path, width=None, height=None, max_frames=REPLAY_MAX_FRAMES):
+        """ init (frames resized to width x height if given) """
+        video_cap = cv2.VideoCapture(path)
+        if not video_cap.isOpened():
+            raise ValueError("cannot open video file : %s" % path)
+        fps = video_cap.get(cv2.CAP_PROP_FPS)
+        self.native_msec = 1000 / fps if fps > 0 else None
+        self.frames = []
+        while len(self.frames) < max_frames:
+            ret, frame = video_cap.read()
+            if not ret:
+                break
+            if width and height and frame.shape[:2] != (height, width):
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            self.frames.append(frame)
+        if len(self.frames) == max_frames and video_cap.grab():
+            total = int(video_cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            print("Replay source : first {} of {} frames kept, video truncated : {}".format(
+                max_frames, total if total > max_frames else "more", path))
+        video_cap.release()
+        if not self.frames:
+            raise ValueError("no frame in video file : %s" % path)
+        self.index = 0
+
+    def read(self, image=None):
+        """ (ret, frame) like cv2.VideoCapture (preloaded frame, image not used) """
+        frame = self.frames[self.index]
+        self.index = (self.index + 1) % len(self.frames)
+        return True, frame
+
+    def grab(self):
+        """ skip frame like cv2.VideoCapture """
+        self.index = (self.index + 1) % len(self.frames)
+        return True
+
+    def frame_msec(self):
+        """ native frame interval (None if unknown) """
+        return self.native_msec
+
+    def release(self):
+        """ free frames """
+        self.frames = []
+
+
+class ChangingSource(abc.ABC):
+    """ synthetic frame whose rows change by change ratio per frame (rotating band of rows) """
+    def __init__(self, width, height, change_ratio=1.0):
+        """ init """
+        self.frame = numpy.zeros((height, width, 3), dtype=numpy.uint8)
+        self.change_rows = min(max(int(round(height * change_ratio)), 0), height)
+        self.row = 0  # first row of next changed band
+        self.count = 0
+
+    def read(self, image=None):
+        """ (ret, frame) like cv2.VideoCapture (frame buffer reused, image not used) """
+        height = self.frame.shape[0]
+        if self.count == 0 or self.change_rows == height:
+            self.fill(0, height)
+        elif self.change_rows > 0:
+            end = self.row + self.change_rows
+            self.fill(self.row, min(end, height))
+            if end > height:
+                self.fill(0, end - height)
+            self.row = end % height
+        self.count = self.count + 1
+        return True, self.frame
+
+    def grab(self):
+        """ skip frame like cv2.VideoCapture (changed rows still written, next frame changes only its band) """
+        return self.read()[0]
+
+    @abc.abstractmethod
+    def fill(self, row_start, row_end):
+        """ write frame rows of current frame """
+
+    def release(self):
+        """ nothing to close """
+
+
+class SyntheticSource(ChangingSource):
+    """ moving color gradient """
+    def __init__(self, width=640, height=480, step=4, change_ratio=1.0):
+        """ init """
+        super().__init__(width, height, change_ratio)
+        x = numpy.linspace(0, 255, width, dtype=numpy.float32)
+        y = numpy.linspace(0, 255, height, dtype=numpy.float32)[:, None]
+        self.pattern = numpy.empty((height, width * 2, 3), dtype=numpy.uint8)
+        self.pattern[:, :width, 0] = x
+        self.pattern[:, :width, 1] = y
+        self.pattern[:, :width, 2] = (x + y) / 2
+        self.pattern[:, width:] = self.pattern[:, :width]  # 2 periods, frame is window of pattern
+        self.width = width
+        self.step = step
+
+    def fill(self, row_start, row_end):
+        """ gradient window moved by step every frame """
+        offset = self.count * self.step % self.width
+        self.frame[row_start:row_end] = self.pattern[row_start:row_end, offset:offset + self.width]
+
+
+class NoiseSource(ChangingSource):
+    """ random pixels (worst case for compression & delta), same sequence every run """
+    def __init__(self, width=640, height=480, change_ratio=1.0, seed=NOISE_SEED):
+        """ init """
+        super().__init__(width, height, change_ratio)
+        rng = numpy.random.default_rng(seed)
+        # noise rows generated once, frame rows are taken at moving position of pool
+        self.pool = rng.integers(0, 256, (height * 2 + 1, width, 3), dtype=numpy.uint8)
+
+    def fill(self, row_start, row_end):
+        """ noise rows of pool shifted every frame """
+        offset = self.count % (self.pool.shape[0] - self.frame.shape[0])
+        self.frame[row_start:row_end] = self.pool[offset + row_start:offset + row_end]
+
+
+class StillImageSource:
+    """ same image every frame """
+    def __init__(self, path):
+        """ init """
+        self.frame = cv2.imread(path, cv2.IMREAD_COLOR)
+        if self.frame is None:
+            raise ValueError("cannot read image : %s" % path)
+
+    def read(self, image=None):
+        """ (ret, frame) like cv2.VideoCapture (image not used) """
+        return True, self.frame
+
+    def grab(self):
+        """ skip frame like cv2.VideoCapture """
+        return True
+
+    def release(self):
+        """ nothing to close """
+
+
+def open_source(source_type, path=None, width=640, height=480, change_ratio=1.0):
+    """ frame source by type (file / replay / synthetic / noise / image) """
+    if source_type in PATH_SOURCE_TYPES and path is None:
+        raise ValueError("%s source needs a path" % source_type)
+    if source_type == "file":
+        return VideoFileSource(path)
+    if source_type == "replay":
+        return ReplaySource(path, width, height)
+    if source_type == "synthetic":
+        return SyntheticSource(width, height, change_ratio=change_ratio)
+    if source_type == "noise":
+        return NoiseSource(width, height, change_ratio)
+    if source_type == "image":
+        return StillImageSource(path)
+    raise ValueError("unknown source type : " + str(source_type))
@@ -0,0 +1,355 @@
+# Copyright 2024 ETRI. 
+# License-identifier:GNU General Public License v3.0 or later
+# yssong00@etri.re.kr
+
+# This program is free software: you can redistribute it and/or modify 
+# it under the terms of the GNU General Public License as published 
+# by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; 
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with this program. 
+# If not, see <https://www.gnu.org/licenses/>.
+
+""" Sensor Sharing Service Transmit Path(scatter-gather batch send) """
+
+import os
+import time
+import threading
+import traceback
+import packet_codec
+from datetime import datetime
+from collections import deque
+
+
+# Max buffers per sendmsg (IOV_MAX)
+try:
+    SENDMSG_MAX_BUFFERS = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    SENDMSG_MAX_BUFFERS = 1024
+if SENDMSG_MAX_BUFFERS <= 0:
+    SENDMSG_MAX_BUFFERS = 1024
+
+# Transmit priority class (lower value sent first)
+PRIORITY_CONTROL = 0  # ping(RTT) reply
+PRIORITY_VIDEO = 1
+PRIORITY_NAMES = ("control", "video")
+TX_BATCH_PACKETS = 16  # packets per send before checking higher priority queues
+
+# Pacing
+PACING_MIN_SLEEP = 0.002  # seconds, shorter waits are batched into next sleep (OS timer granularity)
+PACING_SPREAD = 0.9       # fraction of frame interval to spread frame packets over (frame spread mode)
+
+
+class BatchSender:
+    """ send list of buffers with as few syscalls as possible """
+    def __init__(self, sock):
+        """ init """
+        self.sock = sock
+        self.use_sendmsg = hasattr(sock, "sendmsg")
+        self.batches = 0
+        self.syscalls = 0
+        self.bytes_sent = 0
+        self.partial_sends = 0
+        self.last_syscalls = 0
+        self.last_bytes = 0
+
+    def send_buffers(self, buffers):
+        """ send all buffers(bytes, bytearray, memoryview) in order """
+        syscalls = 0
+        total = 0
+        if self.use_sendmsg:
+            pending = [memoryview(buf).cast("B") for buf in buffers]
+            start = 0
+            while start < len(pending):
+                chunk = pending[start:start + SENDMSG_MAX_BUFFERS]
+                sent = self.sock.sendmsg(chunk)
+                syscalls = syscalls + 1
+                total = total + sent
+                # skip fully sent buffers, keep rest of partially sent buffer
+                for view in chunk:
+                    if sent >= len(view):
+                        sent = sent - len(view)
+                        start = start + 1
+                    else:
+                        if sent > 0:
+                            pending[start] = view[sent:]
+                            self.partial_sends = self.partial_sends + 1
+                        break
+        else:
+            # sendmsg not supported(Windows) : one joined buffer per IOV_MAX buffers
+            for start in range(0, len(buffers), SENDMSG_MAX_BUFFERS):
+                data = b"".join(buffers[start:start + SENDMSG_MAX_BUFFERS])
+                self.sock.sendall(data)
+                syscalls = syscalls + 1
+                total = total + len(data)
+
+        self.batches = self.batches + 1
+        self.syscalls = self.syscalls + syscalls
+        self.bytes_sent = self.bytes_sent + total
+        self.last_syscalls = syscalls
+        self.last_bytes = total
+        return total
+
+    def stats(self):
+        """ syscalls per batch(frame) & bytes per syscall """
+        return {
+            "batches": self.batches,
+            "syscalls": self.syscalls,
+            "bytes": self.bytes_sent,
+            "partial_sends": self.partial_sends,
+            "syscalls_per_batch": self.syscalls / self.batches if self.batches else 0.0,
+            "bytes_per_syscall": self.bytes_sent / self.syscalls if self.syscalls else 0.0,
+            "last_syscalls": self.last_syscalls,
+            "last_bytes": self.last_bytes,
+        }
+
+
+class TokenBucketPacer:
+    """ token bucket on monotonic clock (rate_bps 0 : rate set per frame by spread()) """
+    def __init__(self, rate_bps=0, burst_bytes=6000, min_sleep=PACING_MIN_SLEEP):
+        """ init """
+        self.frame_spread = rate_bps <= 0
+        self.byte_rate = rate_bps / 8 if rate_bps > 0 else 0.0
+        self.stream_rates = {}  # frame spread mode : stream id -> bytes/s
+        self.burst = burst_bytes
+        self.min_sleep = min_sleep
+        self.tokens = float(burst_bytes)
+        self.last_time = time.monotonic()
+        self.target_time = None  # end of current sleep
+        # statistics since last stats()
+        self.bytes_sent = 0
+        self.sleeps = 0
+        self.lateness_sum = 0.0
+        self.lateness_max = 0.0
+        self.stats_time = self.last_time
+
+    def spread(self, frame_bytes, frame_interval, stream_id=0):
+        """ frame spread mode : rate to send frame_bytes over frame interval (sum of streams) """
+        if self.frame_spread and frame_interval > 0:
+            self.stream_rates[stream_id] = frame_bytes / (frame_interval * PACING_SPREAD)
+            self.byte_rate = max(sum(self.stream_rates.values()), 1.0)
+
+    def refill(self, now):
+        """ add tokens for elapsed time """
+        self.tokens = min(self.burst, self.tokens + (now - self.last_time) * self.byte_rate)
+        self.last_time = now
+
+    def delay(self):
+        """ seconds to wait before next send (0 : send now) """
+        now = time.monotonic()
+        if self.byte_rate <= 0:
+            return 0.0
+        self.refill(now)
+        wait = -self.tokens / self.byte_rate if self.tokens < 0 else 0.0
+        if wait >= self.min_sleep:
+            if self.target_time is None:
+                self.target_time = now + wait
+            return wait
+        if self.target_time is not None:
+            # woke up after sleep : lateness against planned send time
+            lateness = max(now - self.target_time, 0.0)
+            self.lateness_sum = self.lateness_sum + lateness
+            self.lateness_max = max(self.lateness_max, lateness)
+            self.sleeps = self.sleeps + 1
+            self.target_time = None
+        return 0.0
+
+    def consume(self, nbytes):
+        """ bytes sent (tokens may go negative, debt is paid by next delay) """
+        self.refill(time.monotonic())
+        self.tokens = self.tokens - nbytes
+        self.bytes_sent = self.bytes_sent + nbytes
+
+    def stats(self):
+        """ configured vs achieved rate & pacing jitter since last call """
+        now = time.monotonic()
+        result = {
+            "rate_bps": self.byte_rate * 8,
+            "achieved_bps": self.bytes_sent * 8 / (now - self.stats_time) if now > self.stats_time else 0.0,
+            "sleeps": self.sleeps,
+            "jitter_ms": self.lateness_sum * 1000 / self.sleeps if self.sleeps else 0.0,
+            "max_jitter_ms": self.lateness_max * 1000,
+        }
+        self.bytes_sent = 0
+        self.sleeps = 0
+        self.lateness_sum = 0.0
+        self.lateness_max = 0.0
+        self.stats_time = now
+        return result
+
+
+class TransmitScheduler:
+    """ single transmit thread fed by priority queues (one queue per traffic class) """
+    def __init__(self, sock, batch_packets=TX_BATCH_PACKETS, pacer=None, packet_debug=False):
+        """ init (packet_debug : print header of every sent video packet by scapy) """
+        self.batch_sender = BatchSender(sock)
+        self.batch_packets = batch_packets
+        self.pacer = pacer  # TokenBucketPacer for video packets
+        self.packet_debug = packet_debug
+        self.queues = [deque() for _ in PRIORITY_NAMES]  # (enqueue time, [buffer, ...], ticket) per packet
+        self.pending = [0] * len(PRIORITY_NAMES)  # queued + sending packets
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.trig = True
+        # statistics since last stats()
+        self.sent = [0] * len(PRIORITY_NAMES)
+        self.max_depth = [0] * len(PRIORITY_NAMES)
+        self.wait_sum = [0.0] * len(PRIORITY_NAMES)
+        self.wait_max = [0.0] * len(PRIORITY_NAMES)
+
+    def start(self):
+        """ start transmit thread """
+        self.thread.start()
+
+    def submit(self, priority, packets):
+        """ queue pre-encoded packets : [[buffer, ...], ...] (buffers must stay unchanged until sent)
+            -> ticket for wait_sent """
+        enqueue_time = time.perf_counter()
+        ticket = [len(packets)]  # packets not sent yet
+        with self.condition:
+            queue = self.queues[priority]
+            queue.extend((enqueue_time, packet, ticket) for packet in packets)
+            self.pending[priority] = self.pending[priority] + len(packets)
+            self.max_depth[priority] = max(self.max_depth[priority], len(queue))
+            self.condition.notify_all()
+        return ticket
+
+    def wait_sent(self, priority, timeout=None, ticket=None):
+        """ block until packets of ticket(all queued packets of priority class if None) are sent """
+        with self.condition:
+            if ticket is not None:
+                return self.condition.wait_for(lambda: ticket[0] == 0 or not self.trig, timeout)
+            return self.condition.wait_for(lambda: self.pending[priority] == 0 or not self.trig, timeout)
+
+    def run(self):
+        """ send highest priority packets first """
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: not self.trig or any(self.queues))
+                if not self.trig:
+                    break
+                priority = next(i for i, queue in enumerate(self.queues) if queue)
+                queue = self.queues[priority]
+                paced = priority == PRIORITY_VIDEO and self.pacer is not None
+                if paced:
+                    wait = self.pacer.delay()
+                    if wait > 0:
+                        self.condition.wait(wait)  # control packets wake up transmit thread
+                        continue
+                items = [queue.popleft()]
+                nbytes = sum(len(buf) for buf in items[0][1])
+                while queue and len(items) < self.batch_packets:
+                    packet_bytes = sum(len(buf) for buf in queue[0][1])
+                    if paced and nbytes + packet_bytes > self.pacer.burst:
+                        break
+                    items.append(queue.popleft())
+                    nbytes = nbytes + packet_bytes
+                count = len(items)
+
+            dequeue_time = time.perf_counter()
+            buffers = []
+            for enqueue_time, packet, ticket in items:
+                buffers.extend(packet)
+                if self.packet_debug and priority == PRIORITY_VIDEO:
+                    packet_codec.show_packet(b"".join(packet))
+            try:
+                self.batch_sender.send_buffers(buffers)
+            except BaseException:
+                print(traceback.format_exc())
+            if paced:
+                self.pacer.consume(nbytes)
+
+            with self.condition:
+                for enqueue_time, packet, ticket in items:
+                    ticket[0] = ticket[0] - 1
+                    wait = dequeue_time - enqueue_time
+                    self.wait_sum[priority] = self.wait_sum[priority] + wait
+                    self.wait_max[priority] = max(self.wait_max[priority], wait)
+                self.sent[priority] = self.sent[priority] + count
+                self.pending[priority] = self.pending[priority] - count
+                self.condition.notify_all()
+
+    def stop(self):
+        """ stop transmit thread (queued packets are discarded) """
+        with self.condition:
+            self.trig = False
+            for queue in self.queues:
+                queue.clear()
+            self.condition.notify_all()
+        if self.thread.is_alive():
+            self.thread.join(1)
+
+    def stats(self):
+        """ queue depth & time in queue per class since last call """
+        with self.condition:
+            result = {}
+            for i, name in enumerate(PRIORITY_NAMES):
+                result[name] = {
+                    "depth": len(self.queues[i]),
+                    "max_depth": self.max_depth[i],
+                    "packets": self.sent[i],
+                    "wait_ms": self.wait_sum[i] * 1000 / self.sent[i] if self.sent[i] else 0.0,
+                    "max_wait_ms": self.wait_max[i] * 1000,
+                }
+                self.sent[i] = 0
+                self.max_depth[i] = len(self.queues[i])
+                self.wait_sum[i] = 0.0
+                self.wait_max[i] = 0.0
+        return result
+
+
+class PingResponder:
+    """ reply receiver ping(RTT) through transmit scheduler, feed receiver feedback to rate controller """
+    def __init__(self, sock, tx_scheduler, rate_ctrl=None):
+        """ init """
+        self.sock = sock
+        self.tx_scheduler = tx_scheduler
+        self.rate_ctrl = rate_ctrl
+        self.header = packet_codec.tx_pdu_header(14)
+        self.replies = 0
+        self.trig = True
+
+    def handle(self, packet):
+        """ received packet -> True if ping replied """
+        if packet[38:40] == packet_codec.PING_INDICATOR:
+            ping_payload = packet[38:38 + int.from_bytes(packet[36:38], "big")]
+        elif packet[-6:][:2] == packet_codec.PING_INDICATOR:
+            ping_payload = packet[-6:]
+        else:
+            return False
+
+        # Receiver feedback (PDR, latency)
+        if self.rate_ctrl is not None and len(ping_payload) >= 6 + packet_codec.FEEDBACK_STRUCT.size:
+            pdr, latency = packet_codec.FEEDBACK_STRUCT.unpack_from(ping_payload, 6)
+            self.rate_ctrl.update(pdr / 100, latency / 10)
+        # Delay calculate time data
+        recv_time = datetime.now().strftime("%S%f")
+        byte_rt = int(recv_time).to_bytes(length=4, byteorder="big", signed=False)
+        send_time = datetime.now().strftime("%S%f")
+        byte_st = int(send_time).to_bytes(length=4, byteorder="big", signed=False)
+        # RTT packet delivery
+        payload_data = packet_codec.PING_INDICATOR + ping_payload[2:6] + byte_rt + byte_st
+        self.tx_scheduler.submit(PRIORITY_CONTROL, [[self.header + payload_data]])
+        self.replies = self.replies + 1
+        return True
+
+    def run(self):
+        """ receive loop (until stop or socket closed) """
+        while self.trig:
+            try:
+                packet = self.sock.recv(1024)
+                if not packet:
+                    break
+                self.handle(packet)
+            except BaseException:
+                if self.trig:
+                    print(traceback.format_exc())
+                else:
+                    break
+
+    def stop(self):
+        """ stop receive loop (socket close wakes up recv) """
+        self.trig = False
@@ -16,14 +16,17 @@
 """ Sensor Sharing Service for Sender Widnow(Send video-data) """
 
 import cv2
-import numpy
 import serial
 from socket import *
 from scapy.all import *
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
-import packet_header_struct
+import rate_controller
+import sender_frame
+import sender_pipeline
+import sender_source
+import sender_transmit
 from pygrabber.dshow_graph import FilterGraph
 
 
@@ -38,12 +41,26 @@ SER_BAUD = 9600     # Serial Baud Rate
 # 5G NR Device Connection Variable
 DEVICE_ADDR = '192.168.1.11'
 DEVICE_PORT = 47347
-SOCKET_SEND_DELAY = 0  # if OBU Resource reservation Period = 0, set SOCKET_SEND_DELAY > 0
+SEND_PACING = True         # pace video packets to match OBU resource reservation period
+SEND_PACING_RATE = 0       # Mbps, 0 : spread packets of each frame over frame interval
+SEND_PACING_BURST = 6000   # bytes sent back-to-back at most
 
 # Video Data Size
 SENDER_FRAME_MSEC = 120  # Only 'int' value & Milliseconds ( 60 Frame -> 1000 milliseconds / 60 frames = 16.66666....)
 SEND_FRAME_WIDTH = 300
 SEND_FRAME_HEIGHT = 300
+SEND_STREAMS = 2  # capture sources selectable at once (stream id = selector order)
+SEND_VIDEO_CODEC = "Raw"  # "Raw" : BGR rows, "JPEG" / "WebP" : compressed row-bands
+SEND_CODEC_QUALITY = 80   # JPEG / WebP quality (1 ~ 100)
+SEND_DELTA_MODE = False   # True : send only changed rows (+ periodic full frame)
+SEND_ADAPTIVE_RATE = False  # True : adjust frame size / interval / quality by receiver feedback
+SEND_PACK_ROWS = True     # True : pack raw rows(and row fragments) up to SEND_PAYLOAD_BUDGET per packet
+SEND_PAYLOAD_BUDGET = 1300  # video payload bytes per packet (receiver MAX_PAYLOAD_SIZE)
+SEND_SYNTHETIC_CHANGE_RATIO = 1.0  # synthetic sources : fraction of rows changed per frame
+# Test frame sources (combo item -> sender_source type), no camera needed
+TEST_SOURCES = {"Replay Video(preloaded)": "replay", "Synthetic Gradient": "synthetic", "Synthetic Noise": "noise"}
+SEND_PREVIEW_FPS = 10     # preview frames shown per second at most (0 : every captured frame)
+SEND_FEC_GROUP = 0        # video packets per XOR parity packet (0 : FEC off, overhead = 1 / SEND_FEC_GROUP)
 
 # RTT Variable
 RTT_TIMER = 0
@@ -52,9 +69,9 @@ RTT_TIMER = 0
 WS_REQ = b"\xf1\xf1\x00\x01\x00\x00\x00\x00\x00\x00\x14\x97\x00\x00\x00\x00"
 WS_RESP_MAGIC_NUM = b'\xf1\xf2'
 PING_INDICATOR = b'\x03\x02'
+PACKET_DEBUG = False  # True : print every sent video packet header by scapy
 
 
-pkt_seq_num = 0
 latitude = 12.0
 longitude = 34.0
 camera_list = {}
@@ -64,9 +81,9 @@ def resource_path(relative_path):
     base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base_path, relative_path)
 
-def rescale_frame(original_frame, width, height):
-    """ update frame size """
-    return cv2.resize(original_frame, (width, height), interpolation=cv2.INTER_AREA)
+def current_position():
+    """ latitude & longitude from GPS """
+    return latitude, longitude
 
 def find_camera_list():
     """ find camera list """
@@ -76,62 +93,6 @@ def find_camera_list():
     for device_index, device_name in enumerate(devices):
         camera_list[device_index] = device_name
 
-def send_5g(send_sock, video_data):
-    """ send video_data """
-    global pkt_seq_num
-    global latitude
-    global longitude
-    pkt_seq_num_temp = pkt_seq_num.to_bytes(4, byteorder='big')
-    send_data = b'\x03\x01' + pkt_seq_num_temp + video_data
-    pkt_seq_num = (pkt_seq_num + 1) % 1000000
-
-    db_v2x_tmp_p = packet_header_struct.DB_V2X(
-        eDeviceType=htonl(0x0001),
-        eTeleCommType=htonl(0x0002),
-        unDeviceId=0x0000,
-        ulTimeStamp=0x0000,
-        eServiceId=htonl(0x0005),
-        eActionType=htonl(0x0001),
-        eRegionId=htonl(0x0004),
-        ePayloadType=htonl(0x000b),
-        eCommId=htonl(0x0001),
-        usDbVer=0x0001,
-        usHwVer=0x0111,
-        usSwVer=0x0001,
-        ulPayloadLength=int(latitude * 1000000),
-        ulPayloadCrc32=int(longitude * 1000000),
-    )
-
-    v2x_tx_pdu_p = packet_header_struct.V2X_TxPDU(
-        magic_num=htons(0xf2f2),
-        ver=0x0001,
-        psid=5271,
-        e_v2x_comm_type=0,
-        e_payload_type=4,
-        elements_indicator=0,
-        tx_power=20,
-        e_signer_id=0,
-        e_priority=0,
-        channel_load=0,
-        reserved1=0,
-        expiry_time=0,
-        transmitter_profile_id=100,
-        peer_l2id=0,
-        reserved2=0,
-        reserved3=0,
-        crc=0,
-        length=len(bytes(db_v2x_tmp_p)) + len(send_data)
-    )
-
-    serialized = bytes(v2x_tx_pdu_p) + bytes(db_v2x_tmp_p) + send_data
-    try:
-        send_sock.send(serialized)
-    except BaseException:
-        print(traceback.format_exc())
-    if SOCKET_SEND_DELAY != 0:
-        time.sleep(SOCKET_SEND_DELAY)
-
-
 class GPSWorker(QThread):
     """ GPS Processing for position """
     def __init__(self):
@@ -184,85 +145,63 @@ class GPSWorker(QThread):
 
 
 class CaptureWorker(QThread):
-    """ from video-data to frame data """
-    def __init__(self, sock, cap, label):
+    """ from video-data to frame data (capture / encode / send stages) """
+    preview_signal = pyqtSignal(object)
+
+    def __init__(self, tx_scheduler, cap, label, codec=SEND_VIDEO_CODEC, quality=SEND_CODEC_QUALITY,
+                 delta=SEND_DELTA_MODE, rate_ctrl=None, pack_rows=SEND_PACK_ROWS, fec_group=SEND_FEC_GROUP,
+                 source_msec=None, stream_id=0, preview_fps=SEND_PREVIEW_FPS):
         """ init """
         super().__init__()
-        global pkt_seq_num
-        pkt_seq_num = 0
         self.video_cap = cap
         self.video_label = label
-        self.sock = sock
-        self.trig = True
+        self.rate_ctrl = rate_ctrl
+        self.pipeline = sender_pipeline.SenderPipeline(
+            cap, tx_scheduler,
+            lambda: sender_pipeline.create_packetizer(codec, quality, pack_rows, rate_ctrl is not None,
+                                                      SEND_PAYLOAD_BUDGET, stream_id),
+            SEND_FRAME_WIDTH, SEND_FRAME_HEIGHT, source_msec or SENDER_FRAME_MSEC, delta, fec_group, rate_ctrl,
+            current_position, self.preview_signal.emit if label is not None else None, source_msec=source_msec,
+            stream_id=stream_id, preview_fps=preview_fps)
+        # preview rendered by GUI thread (queued connection)
+        self.preview_signal.connect(self.show_preview)
 
     def run(self):
         """ capture video """
         # 2023.06.08 frame 100 msec
-        while self.trig:
-            cv2.waitKey(SENDER_FRAME_MSEC)
-            ret, frame = self.video_cap.read()
-            if ret:
-                try:
-                    np_frame = numpy.asarray(rescale_frame(frame, SEND_FRAME_WIDTH, SEND_FRAME_HEIGHT))
-                except BaseException:
-                    print(traceback.format_exc())
-                try:
-                    # Update video label
-                    frame = cv2.cvtColor(np_frame, cv2.COLOR_BGR2RGB)
-                    image = QImage(frame, frame.shape[1], frame.shape[0], QImage.Format_RGB888)
-                    pixmap = QPixmap.fromImage(image)
-                    pixmap = pixmap.scaled(self.video_label.width(), self.video_label.height(), Qt.KeepAspectRatio)
-                    self.video_label.setPixmap(pixmap)
-                except BaseException:
-                    print(traceback.format_exc())
-
-                try:
-                    for i in range(SEND_FRAME_HEIGHT):
-                        data = np_frame[i].flatten().tobytes()
-                        line_num = struct.pack(">h", i)
-                        send_5g(self.sock, line_num + data)
-                except BaseException:
-                    print(traceback.format_exc())
-
-        self.video_label.setPixmap(QPixmap(resource_path('resource/stop_icons.png')))
+        self.pipeline.start()
+        self.pipeline.run()
+        if self.video_label is not None:
+            self.video_label.setPixmap(QPixmap(resource_path('resource/stop_icons.png')))
         self.video_cap.release()
 
+    def show_preview(self, np_frame):
+        """ update video label (GUI thread) """
+        try:
+            if self.pipeline.trig:
+                image = QImage(np_frame, np_frame.shape[1], np_frame.shape[0], np_frame.strides[0],
+                               QImage.Format_BGR888)
+                pixmap = QPixmap.fromImage(image)
+                pixmap = pixmap.scaled(self.video_label.width(), self.video_label.height(), Qt.KeepAspectRatio)
+                self.video_label.setPixmap(pixmap)
+        except BaseException:
+            print(traceback.format_exc())
+        self.pipeline.preview_buffer.done()
+
     def stop(self):
         """ stop capture """
-        self.trig = False
+        self.pipeline.stop()
         self.quit()
         self.wait(100)
 
 
 class PingWorker(QThread):
     """ Ping Processing for latency """
-    def __init__(self, sock):
+    def __init__(self, sock, tx_scheduler, rate_ctrl=None):
         """ init """
         super().__init__()
         self.sock = sock
-        send_ping_length = 14
-        v2x_tx_pdu_p = packet_header_struct.V2X_TxPDU(
-            magic_num=htons(0xf2f2),
-            ver=0x0001,
-            psid=5271,
-            e_v2x_comm_type=0,
-            e_payload_type=4,
-            elements_indicator=0,
-            tx_power=20,
-            e_signer_id=0,
-            e_priority=0,
-            channel_load=0,
-            reserved1=0,
-            expiry_time=0,
-            transmitter_profile_id=100,
-            peer_l2id=0,
-            reserved2=0,
-            reserved3=0,
-            crc=0,
-            length=send_ping_length
-        )
-
-        self.header = bytes(v2x_tx_pdu_p)
+        self.ping_responder = sender_transmit.PingResponder(sock, tx_scheduler, rate_ctrl)
 
         self.trig = True
 
@@ -272,18 +211,7 @@ class PingWorker(QThread):
             # RTT 패킷 수신
             try:
                 packet = self.sock.recv(1024)
-
-                if packet[-6:][:2] == PING_INDICATOR :
-                    # Delay calculate time data
-                    recv_time = datetime.now().strftime("%S%f")
-                    byte_rt = int(recv_time).to_bytes(length=4, byteorder="big", signed=False)
-                    send_time = datetime.now().strftime("%S%f")
-                    byte_st = int(send_time).to_bytes(length=4, byteorder="big", signed=False)
-                    # RTT packet delivery
-                    payload_data = b'\x03\x02' + packet[-4:] + byte_rt + byte_st
-
-                    send_data = self.header + payload_data
-                    self.sock.send(send_data)
+                if self.ping_responder.handle(packet):
                     time.sleep(RTT_TIMER)
             except BaseException:
                 print(traceback.format_exc())
@@ -334,21 +262,73 @@ class SenderWindow(QWidget):
         # Video file path
         self.video_file_address = QLineEdit()
         self.video_file_address.setPlaceholderText("Saved Video File Path(If send video file)")
-        # Type of transmission data(Camera / Video)
+        # Type of transmission data(Camera / Video), additional streams can be "None"
         self.type_combo = QComboBox(self)
+        self.stream_combos = [self.type_combo] + [QComboBox(self) for _ in range(SEND_STREAMS - 1)]
         find_camera_list()
-        for i in camera_list:
-            self.type_combo.addItem(camera_list[i])
-        self.type_combo.addItem("Saved Video")
+        self.fill_type_combos()
+        self.stream_layout = QHBoxLayout()
+        for combo in self.stream_combos:
+            self.stream_layout.addWidget(combo)
+        # Video codec(Raw / JPEG / WebP) & quality
+        self.codec_combo = QComboBox(self)
+        self.codec_combo.addItems(list(sender_frame.VIDEO_CODECS))
+        self.codec_combo.setCurrentText(SEND_VIDEO_CODEC)
+        self.quality_spin = QSpinBox(self)
+        self.quality_spin.setRange(1, 100)
+        self.quality_spin.setValue(SEND_CODEC_QUALITY)
+        self.quality_spin.setPrefix("Quality : ")
+        # Delta mode(send only changed rows)
+        self.delta_check = QCheckBox("Send changed rows only", self)
+        self.delta_check.setChecked(SEND_DELTA_MODE)
+        # Pack raw rows up to payload budget
+        self.pack_check = QCheckBox("Pack rows", self)
+        self.pack_check.setChecked(SEND_PACK_ROWS)
+        # Adaptive rate(receiver feedback)
+        self.adaptive_check = QCheckBox("Adaptive rate", self)
+        self.adaptive_check.setChecked(SEND_ADAPTIVE_RATE)
+        # FEC group size(0 : off)
+        self.fec_spin = QSpinBox(self)
+        self.fec_spin.setRange(0, 255)
+        self.fec_spin.setValue(SEND_FEC_GROUP)
+        self.fec_spin.setPrefix("FEC group : ")
+        # Pacing rate(0 : spread each frame over frame interval)
+        self.pacing_spin = QSpinBox(self)
+        self.pacing_spin.setRange(0, 1000)
+        self.pacing_spin.setValue(SEND_PACING_RATE)
+        self.pacing_spin.setPrefix("Pacing : ")
+        self.pacing_spin.setSuffix(" Mbps")
+        self.pacing_spin.setSpecialValueText("Pacing : frame spread")
+        self.pacing_spin.setEnabled(SEND_PACING)
+        # Preview rate
+        self.preview_spin = QSpinBox(self)
+        self.preview_spin.setRange(0, 60)
+        self.preview_spin.setValue(SEND_PREVIEW_FPS)
+        self.preview_spin.setPrefix("Preview : ")
+        self.preview_spin.setSuffix(" fps")
+        self.preview_spin.setSpecialValueText("Preview : every frame")
+        self.codec_layout = QHBoxLayout()
+        self.codec_layout.addWidget(self.codec_combo)
+        self.codec_layout.addWidget(self.quality_spin)
+        self.codec_layout.addWidget(self.pack_check)
+        self.codec_layout.addWidget(self.delta_check)
+        self.codec_layout.addWidget(self.adaptive_check)
+        self.codec_layout.addWidget(self.fec_spin)
+        self.codec_layout.addWidget(self.pacing_spin)
+        self.codec_layout.addWidget(self.preview_spin)
+        # Transmit statistics
+        self.stats_label = QLabel()
 
         # UI Arrangement #
         self.layout = QVBoxLayout()
         self.layout.addWidget(self.label)
         self.layout.addWidget(self.video_file_address)
-        self.layout.addWidget(self.type_combo)
+        self.layout.addLayout(self.stream_layout)
+        self.layout.addLayout(self.codec_layout)
         self.layout.addWidget(self.button_play)
         self.layout.addWidget(self.button_pause)
         self.layout.addWidget(self.button_find)
+        self.layout.addWidget(self.stats_label)
 
         # Final UI Layout Arrangement #
         self.setLayout(self.layout)
@@ -359,51 +339,184 @@ class SenderWindow(QWidget):
         self.gps_worker_th = GPSWorker()
         self.gps_worker_th.start()
 
+        # Transmit statistics timer
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.stats_timer.start(1000)  # Cycle : 1 second
 
     def play_send_video(self):
         """ send camera video """
-        # Define OpenCV by type of transmission data(Camera / Video) #
-        if self.type_combo.currentText() == "Saved Video":
-            self.send_data_type = self.video_file_address.text()
-            try:
-                self.video_cap = cv2.VideoCapture(self.send_data_type)
-            except BaseException:
-                print(traceback.format_exc())
+        # Define OpenCV by type of transmission data(Camera / Video) of every stream #
+        captures = []
+        for combo in self.stream_combos:
+            if combo.currentText() == "None":
+                continue
+            capture = self.open_capture(combo.currentText())
+            if capture is None:
+                for video_cap, source_msec in captures:
+                    video_cap.release()
                 return
-        else:
-            for i in camera_list:
-                if self.type_combo.currentText() == camera_list[i]:
-                    try:
-                        self.video_cap = cv2.VideoCapture(cv2.CAP_DSHOW+i)
-                        break
-                    #except Exception as e:
-                    except BaseException:
-                        print(traceback.format_exc())
-                        
-                        return
-
-        # Start Capture Thread
-        self.cap_th = CaptureWorker(self.sock, self.video_cap, self.label)
-        self.ping_th = PingWorker(self.sock)
-        self.cap_th.start()
+            captures.append(capture)
+
+        # Adaptive rate controller
+        self.rate_ctrl = None
+        if self.adaptive_check.isChecked():
+            self.rate_ctrl = rate_controller.RateController(log_path=rate_controller.default_log_path())
+
+        # Transmit thread shared by video & ping
+        pacer = None
+        if SEND_PACING:
+            pacer = sender_transmit.TokenBucketPacer(self.pacing_spin.value() * 1000000, SEND_PACING_BURST)
+        self.tx_scheduler = sender_transmit.TransmitScheduler(self.sock, pacer=pacer, packet_debug=PACKET_DEBUG)
+        self.tx_scheduler.start()
+
+        # Start Capture Thread per stream (preview of first stream)
+        self.cap_ths = []
+        for stream_id, (video_cap, source_msec) in enumerate(captures):
+            self.cap_ths.append(CaptureWorker(self.tx_scheduler, video_cap, self.label if stream_id == 0 else None,
+                                              self.codec_combo.currentText(), self.quality_spin.value(),
+                                              self.delta_check.isChecked(), self.rate_ctrl,
+                                              self.pack_check.isChecked(), self.fec_spin.value(), source_msec,
+                                              stream_id, self.preview_spin.value()))
+        self.ping_th = PingWorker(self.sock, self.tx_scheduler, self.rate_ctrl)
+        for cap_th in self.cap_ths:
+            cap_th.start()
         self.ping_th.start()
         self.button_play.setDisabled(True)
         self.button_pause.setDisabled(False)
+        self.codec_combo.setDisabled(True)
+        self.quality_spin.setDisabled(True)
+        self.pack_check.setDisabled(True)
+        self.delta_check.setDisabled(True)
+        self.adaptive_check.setDisabled(True)
+        self.fec_spin.setDisabled(True)
+        self.pacing_spin.setDisabled(True)
+        self.preview_spin.setDisabled(True)
 
     def pause_video(self):
         """ pause video """
-        self.cap_th.stop()
+        self.tx_scheduler.stop()
+        for cap_th in self.cap_ths:
+            cap_th.stop()
         self.ping_th.stop()
+        if self.rate_ctrl is not None:
+            self.rate_ctrl.close()
         self.button_play.setDisabled(False)
         self.button_pause.setDisabled(True)
+        self.codec_combo.setDisabled(False)
+        self.quality_spin.setDisabled(False)
+        self.pack_check.setDisabled(False)
+        self.delta_check.setDisabled(False)
+        self.adaptive_check.setDisabled(False)
+        self.fec_spin.setDisabled(False)
+        self.pacing_spin.setDisabled(not SEND_PACING)
+        self.preview_spin.setDisabled(False)
 
     def find_camera(self):
         """ select camera """
         find_camera_list()
-        self.type_combo.clear()
+        self.fill_type_combos()
+
+    def fill_type_combos(self):
+        """ camera list + saved video + test sources (+ none for additional streams) """
+        for stream_id, combo in enumerate(self.stream_combos):
+            combo.clear()
+            if stream_id > 0:
+                combo.addItem("None")
+            for i in camera_list:
+                combo.addItem(camera_list[i])
+            combo.addItem("Saved Video")
+            for name in TEST_SOURCES:
+                combo.addItem(name)
+
+    def open_capture(self, source_name):
+        """ (cv2.VideoCapture or test source, native frame msec of saved video) of source """
+        source_msec = None
+        if source_name in TEST_SOURCES:
+            try:
+                source = sender_source.open_source(TEST_SOURCES[source_name], self.video_file_address.text(),
+                                                   SEND_FRAME_WIDTH, SEND_FRAME_HEIGHT, SEND_SYNTHETIC_CHANGE_RATIO)
+                if TEST_SOURCES[source_name] == "replay":
+                    source_msec = source.frame_msec()
+                return source, source_msec
+            except BaseException:
+                print(traceback.format_exc())
+                return None
+        if source_name == "Saved Video":
+            self.send_data_type = self.video_file_address.text()
+            try:
+                video_cap = cv2.VideoCapture(self.send_data_type)
+                # play saved video at native FPS
+                fps = video_cap.get(cv2.CAP_PROP_FPS)
+                if fps > 0:
+                    source_msec = 1000 / fps
+                return video_cap, source_msec
+            except BaseException:
+                print(traceback.format_exc())
+                return None
         for i in camera_list:
-            self.type_combo.addItem(camera_list[i])
-        self.type_combo.addItem("Saved Video")
+            if source_name == camera_list[i]:
+                try:
+                    return cv2.VideoCapture(cv2.CAP_DSHOW+i), source_msec
+                except BaseException:
+                    print(traceback.format_exc())
+                    return None
+        return None
+
+    def update_stats(self):
+        """ update transmit statistics """
+        if not hasattr(self, 'cap_ths'):
+            return
+        stats = self.tx_scheduler.batch_sender.stats()
+        queue_stats = self.tx_scheduler.stats()
+        self.stats_label.setText(
+            "Syscalls/batch : {:.2f}  |  Bytes/syscall : {:.0f}  |  Partial sends : {}\n".format(
+                stats["syscalls_per_batch"], stats["bytes_per_syscall"], stats["partial_sends"])
+            + "  |  ".join("Queue {} : {} (max {}), wait {:.2f} ms (max {:.2f})".format(
+                name, queue["depth"], queue["max_depth"], queue["wait_ms"], queue["max_wait_ms"])
+                for name, queue in queue_stats.items()))
+        for cap_th in self.cap_ths:
+            pipeline = cap_th.pipeline
+            packetizer = pipeline.packetizer
+            stage_stats = pipeline.stats()
+            self.stats_label.setText(self.stats_label.text() + "\n[Stream {}] Encode : {:.2f} ms/frame  |  "
+                                     "{} bytes/frame  |  {} packets/frame".format(
+                                         pipeline.stream_id, packetizer.encode_time * 1000, packetizer.frame_bytes,
+                                         packetizer.frame_packets))
+            if isinstance(packetizer, sender_frame.BandPacketizer):
+                self.stats_label.setText(self.stats_label.text() + "  |  Over budget rows : {} lower quality, "
+                                         "{} raw".format(packetizer.frame_requality_rows, packetizer.frame_raw_rows))
+            if pipeline.delta_filter is not None:
+                self.stats_label.setText(self.stats_label.text() + "  |  Changed rows : {}".format(
+                    pipeline.delta_filter.changed_rows))
+            if pipeline.fec_encoder is not None:
+                self.stats_label.setText(self.stats_label.text() + "  |  FEC : {} parity/frame".format(
+                    pipeline.fec_encoder.parity_packets))
+            if cap_th.video_label is not None:
+                preview_stats = pipeline.preview_buffer.stats()
+                self.stats_label.setText(self.stats_label.text() + "  |  Preview : {:.1f} fps, {} dropped".format(
+                    preview_stats["fps"], preview_stats["dropped"]))
+            self.stats_label.setText(self.stats_label.text() + "\n    Frames : {:.1f} fps  |  Deadline misses : {}  |  "
+                                     "Skipped : {}".format(stage_stats["schedule"]["fps"],
+                                                           stage_stats["schedule"]["misses"],
+                                                           stage_stats["schedule"]["skipped"]))
+            stage_stats.pop("schedule")
+            self.stats_label.setText(self.stats_label.text() + "\n    " + "  |  ".join(
+                "{} : {} frames, {:.2f} ms (max {:.2f}), {} drops".format(
+                    name, stage["frames"], stage["time_ms"], stage["max_time_ms"], stage["drops"])
+                for name, stage in stage_stats.items()))
+        if self.tx_scheduler.pacer is not None:
+            pacing = self.tx_scheduler.pacer.stats()
+            self.stats_label.setText(self.stats_label.text() + "\nPacing : {:.2f} / {:.2f} Mbps (achieved / configured)"
+                                     "  |  Jitter : {:.2f} ms (max {:.2f})".format(
+                                         pacing["achieved_bps"] / 1000000, pacing["rate_bps"] / 1000000,
+                                         pacing["jitter_ms"], pacing["max_jitter_ms"]))
+        if self.rate_ctrl is not None:
+            rate_ctrl = self.rate_ctrl
+            self.stats_label.setText(self.stats_label.text() + "\nRate level {} : {}x{}, {} msec, quality {}".format(
+                rate_ctrl.level, rate_ctrl.frame_width, rate_ctrl.frame_height, rate_ctrl.frame_msec,
+                rate_ctrl.quality) + "  (PDR {:.1f} %, latency {:.1f} ms)".format(
+                rate_ctrl.last_pdr, rate_ctrl.last_latency))
 
 
     def closeEvent(self, event):